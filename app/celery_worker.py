@@ -1,10 +1,30 @@
 import os
-from celery import Celery
+import time
+from contextlib import ExitStack
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from celery import Celery, group
+from celery.exceptions import Retry
+from celery.signals import celeryd_init, worker_process_init
+from kombu import Queue
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
-from app.models import Document, Application, Job
-from app.services.document_service import extract_text_from_file, create_chunks
-from app.services.ai_service import generate_embedding, analyze_resume
+from app.models import Document, DocumentChunk, Application, Job, LeaveRequest
+from app.services.document_service import extract_text_from_blob, iter_text_segments, stream_chunks, hash_chunk
+from app.config import settings
+from app.services.ai_service import analyze_leave, generate_embeddings, warm_up_models
+from app.services.answer_cache import invalidate_company_answers
+from app.services.chunk_writer import bulk_insert_chunks
+from app.services.score_cache import cached_analyze_resume, purge_expired
+from app.services.ats_service import (
+    apply_skill_gap, backfill_profiles_from_applications, ensure_job_embedding, get_or_create_profile,
+    above_llm_threshold, find_email, profile_prompt_text, search_talent_pool, select_top_k_for_llm,
+    similarity_score
+)
+from app.services.skill_service import merge_missing_skills
+from app.services.storage import delete_blobs, get_blob_store
+from app.services.events import publish_application, publish_document
+from app.services.leave_balance import rebuild_balances, record_status_change
 from app.services.google_calendar import create_meeting_event
 from app.services.gmail_service import send_google_email
 
@@ -15,6 +35,79 @@ celery_app = Celery(
     backend=os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 )
 
+# 2. Queues & Routing (one queue per workload class, so they never block each other)
+#   ingest-cpu : extraction + embedding (CPU bound, torch)
+#   llm        : Groq calls (latency bound, mostly waiting on the network)
+#   notify     : Gmail / Calendar (fast, must never wait behind a resume burst)
+celery_app.conf.update(
+    task_queues=(Queue("ingest-cpu"), Queue("llm"), Queue("notify")),
+    task_default_queue="notify",
+    task_routes={
+        "process_document_task": {"queue": "ingest-cpu"},
+        "embed_chunk_batch_task": {"queue": "ingest-cpu"},
+        "finalize_document_task": {"queue": "ingest-cpu"},
+        "document_pipeline_failed_task": {"queue": "ingest-cpu"},
+        "scan_resume_task": {"queue": "ingest-cpu"},
+        "prescore_applications_task": {"queue": "ingest-cpu"},
+        "source_talent_pool_task": {"queue": "ingest-cpu"},
+        "backfill_candidate_profiles_task": {"queue": "ingest-cpu"},
+        "llm_score_application_task": {"queue": "llm"},
+        "triage_leave_task": {"queue": "llm"},
+        "rebuild_leave_balances_task": {"queue": "notify"},
+        "purge_score_cache_task": {"queue": "notify"},
+        "schedule_meeting_task": {"queue": "notify"},
+        "send_email_task": {"queue": "notify"},
+    },
+    # No pipeline reads task results back (document ingestion tracks completion on the Document row,
+    # so a long ingest can't outlive its state); stray results are dropped after an hour
+    result_expires=3600,
+    # Periodic jobs (run `celery -A app.celery_worker beat` once per deployment)
+    beat_schedule={
+        "purge-score-cache": {"task": "purge_score_cache_task", "schedule": 6 * 3600},
+    },
+    worker_prefetch_multiplier=1,
+)
+
+# Defaults per queue, applied when a worker is started with -Q <queue> (CLI -c / --prefetch-multiplier still win).
+#   celery -A app.celery_worker worker -Q ingest-cpu -n ingest@%h
+#   celery -A app.celery_worker worker -Q llm -P threads -n llm@%h
+#   celery -A app.celery_worker worker -Q notify -n notify@%h
+WORKER_PROFILES = {
+    "ingest-cpu": {"concurrency": max(1, (os.cpu_count() or 2) // 2), "prefetch_multiplier": 1, "warmup": True},
+    "llm": {"concurrency": 16, "prefetch_multiplier": 4, "warmup": False},
+    "notify": {"concurrency": 4, "prefetch_multiplier": 8, "warmup": False},
+}
+
+_warmup_enabled = settings.EMBEDDING_WARMUP
+
+@celeryd_init.connect
+def configure_worker(conf=None, options=None, **kwargs):
+    """Applies the queue profile and splits CPU cores between prefork children (torch threads)."""
+    global _warmup_enabled
+    options = options or {}
+    queues = options.get("queues") or []
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    profiles = [WORKER_PROFILES[q.strip()] for q in queues if q.strip() in WORKER_PROFILES]
+
+    if profiles:
+        conf.worker_concurrency = max(p["concurrency"] for p in profiles)
+        conf.worker_prefetch_multiplier = min(p["prefetch_multiplier"] for p in profiles)
+        _warmup_enabled = settings.EMBEDDING_WARMUP and any(p["warmup"] for p in profiles)
+
+    # N children x N torch threads each would oversubscribe the cores
+    concurrency = options.get("concurrency") or conf.worker_concurrency or os.cpu_count() or 1
+    torch_threads = settings.TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // int(concurrency))
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    print(f"⚙️ Worker queues={queues or 'all'} concurrency={concurrency} torch_threads={torch_threads}")
+
+# Warm up AI models once per worker child process (prefork), not on every task
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs):
+    if _warmup_enabled:
+        warm_up_models()
+
 # --- Helper: Get DB Session ---
 def get_db():
     db = SessionLocal()
@@ -23,17 +116,71 @@ def get_db():
     finally:
         db.close()
 
-# TASK 1: RAG DOCUMENT PROCESSING 
-@celery_app.task(name="process_document_task")
-def process_document_task(doc_id: int, file_path: str):
+# TASK 1: RAG DOCUMENT PROCESSING (Canvas pipeline)
+#
+#   process_document_task          extract + chunk (streamed together) + diff against indexed chunks;
+#        |                         every INGEST_TASK_BATCH_SIZE new chunks are dispatched as soon as they exist
+#   embed_chunk_batch_task x N     embedding batches spread over all workers, each bulk-writes its rows
+#        |
+#   finalize_document_task         queued once the stream ends; waits until chunks_done == chunks_total, then
+#                                  one transaction: publish new chunks, delete stale ones, re-number kept ones
+#
+# Only one batch of chunk text is held in memory / sent through the broker at a time, and completion is
+# tracked by the counters on the Document row (no chord state in the result backend that could expire).
+# Every run gets a new Document.generation. Its chunks are written with ready=False (retrieval only
+# reads ready chunks), so chat keeps answering from the previous version until finalize swaps the
+# new one in atomically; a failed run's chunks are deleted by the errback.
+# Progress lives on the Document row (status, chunks_total, chunks_done, error) and every
+# change is pushed to the dashboard as a "document" event (app/services/events.py).
+
+def _mark_document_failed(doc_id: int, error: str):
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.id == doc_id).update({"status": "Failed", "error": error[:500]})
+        db.commit()
+        company_id = db.query(Document.company_id).filter(Document.id == doc_id).scalar()
+        publish_document(doc_id, company_id, status="Failed", error=error[:500])
+    finally:
+        db.close()
+
+def _delete_unpublished_chunks(doc_id: int, generation: int):
+    db = SessionLocal()
+    try:
+        db.query(DocumentChunk).filter(
+            DocumentChunk.document_id == doc_id,
+            DocumentChunk.generation == generation,
+            DocumentChunk.ready.is_(False)
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _dispatch_embed_batch(db: Session, doc_id: int, company_id: int, generation: int, batch: list):
+    """Counts the batch into chunks_total (committed before the task can finish) and queues it."""
+    chunks_done, chunks_total = db.execute(
+        update(Document)
+        .where(Document.id == doc_id)
+        .values(chunks_total=Document.chunks_total + len(batch))
+        .returning(Document.chunks_done, Document.chunks_total)
+    ).one()
+    db.commit()
+    embed_chunk_batch_task.apply_async(
+        (doc_id, generation, batch),
+        link_error=document_pipeline_failed_task.s(doc_id=doc_id, generation=generation)
+    )
+    publish_document(doc_id, company_id, status="Embedding", chunks_done=chunks_done, chunks_total=chunks_total)
+
+@celery_app.task(name="process_document_task", ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def process_document_task(doc_id: int, blob_key: str):
     """
-    1. Reads PDF/DOCX.
-    2. Splits into Chunks.
-    3. Generates Embeddings (Vector).
-    4. Saves to Supabase.
+    1. Reads PDF/DOCX (page by page) from the blob store.
+    2. Splits into Chunks (streaming).
+    3. Fans new/changed chunks out to embedding workers, one batch at a time as they are chunked.
+    4. finalize_document_task cleans up and marks the document Ready.
     """
     print(f"🚀 Processing Document ID: {doc_id}")
     db = SessionLocal()
+    generation = None
     
     try:
         # Fetch the initial document record
@@ -41,61 +188,232 @@ def process_document_task(doc_id: int, file_path: str):
         if not doc_record:
             return "Document not found in DB"
 
-        # 1. Extract Text
-        full_text = extract_text_from_file(file_path)
-        if not full_text:
-            print(f"❌ No text extracted from {file_path}")
-            return "Empty file"
+        # Leftovers of an abandoned run (worker lost mid-pipeline) were never published
+        db.query(DocumentChunk).filter(
+            DocumentChunk.document_id == doc_record.id, DocumentChunk.ready.is_(False)
+        ).delete(synchronize_session=False)
+        doc_record.generation += 1
+        generation = doc_record.generation
+        db.commit()
 
-        # 2. Smart Chunking (Recursive)
-        chunks = create_chunks(full_text)
-        print(f"📄 Split into {len(chunks)} chunks.")
+        # 1. Existing chunks of this document (re-upload of an updated file)
+        # Unchanged chunks (same sha256) are kept, only new ones are embedded, stale ones deleted.
+        existing = {}
+        for chunk_id, content_hash, ordinal in db.query(
+            DocumentChunk.id, DocumentChunk.content_hash, DocumentChunk.ordinal
+        ).filter(DocumentChunk.document_id == doc_record.id):
+            existing.setdefault(content_hash, []).append((chunk_id, ordinal))
 
-        # 3. Vectorization & Saving
-        # Strategy: We update the original row with the 1st chunk, 
-        # and create NEW rows for the remaining chunks.
-        
-        for i, chunk_text in enumerate(chunks):
-            embedding_vector = generate_embedding(chunk_text)
-            
-            if i == 0:
-                # Update the existing placeholder row
-                doc_record.content = chunk_text
-                doc_record.embedding = embedding_vector
-            else:
-                # Create new rows for extra chunks
-                new_chunk = Document(
-                    filename=f"{doc_record.filename} (Part {i+1})",
-                    content=chunk_text,
-                    embedding=embedding_vector,
-                    company_id=doc_record.company_id
-                )
-                db.add(new_chunk)
-        
+        company_id = doc_record.company_id
+        doc_record.status = "Embedding"
+        doc_record.chunks_total = 0
+        doc_record.chunks_done = 0
+        doc_record.error = None
         db.commit()
-        print(f"✅ Document processed and indexed successfully!")
-        
-        # Cleanup: Delete local file after processing (Optional, saves space)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        publish_document(doc_id, company_id, status="Embedding", chunks_done=0, chunks_total=0)
 
-        return "Success"
+        # 2. Extract -> Chunk -> Embed as one stream (pages are chunked as soon as they are extracted,
+        #    each full batch of new chunks goes to the embedding workers right away)
+        started_at = time.perf_counter()
+        chunk_count = 0
+        kept_chunks = []     # {"id", "ordinal"} of unchanged chunks at their new position
+        batch = []           # [ordinal, text, hash] that need embedding, not dispatched yet
+        new_count = 0
+        step = settings.INGEST_TASK_BATCH_SIZE
+
+        with get_blob_store().local_copy(blob_key) as file_path:
+            for i, chunk_text in enumerate(stream_chunks(iter_text_segments(file_path))):
+                chunk_count += 1
+                content_hash = hash_chunk(chunk_text)
+                if existing.get(content_hash):
+                    chunk_id, _ = existing[content_hash].pop()
+                    kept_chunks.append({"id": chunk_id, "ordinal": i})
+                else:
+                    batch.append([i, chunk_text, content_hash])
+                    if len(batch) >= step:
+                        _dispatch_embed_batch(db, doc_id, company_id, generation, batch)
+                        new_count += len(batch)
+                        batch = []
+        if batch:
+            _dispatch_embed_batch(db, doc_id, company_id, generation, batch)
+            new_count += len(batch)
+
+        # Workers get the chunk text through the broker, the upload itself is no longer needed
+        delete_blobs([blob_key])
+
+        if chunk_count == 0:
+            print(f"❌ No text extracted from {blob_key}")
+            _mark_document_failed(doc_id, "No text extracted")
+            return "Empty file"
+
+        stale_ids = [chunk_id for matches in existing.values() for chunk_id, _ in matches]
+        print(f"📄 {chunk_count} chunks in {time.perf_counter() - started_at:.2f}s: "
+              f"{chunk_count - new_count} unchanged, {new_count} to embed, {len(stale_ids)} stale.")
+
+        # 3. chunks_total is final now; finalize waits for the batches still running
+        finalize_document_task.delay(doc_id, generation, chunk_count, stale_ids, kept_chunks)
+        return f"Queued {new_count} chunks for embedding"
 
     except Exception as e:
         db.rollback()
         print(f"❌ Error in process_document_task: {e}")
+        _mark_document_failed(doc_id, str(e))
+        if generation is not None:
+            _delete_unpublished_chunks(doc_id, generation)
+        delete_blobs([blob_key])
         return f"Error: {str(e)}"
     finally:
         db.close()
 
+@celery_app.task(name="embed_chunk_batch_task", ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def embed_chunk_batch_task(doc_id: int, generation: int, batch: list):
+    """
+    Embeds one batch of [ordinal, text, hash] chunks and bulk-writes them (not yet searchable).
+    Idempotent: a redelivered batch whose rows were already committed is skipped.
+    """
+    db = SessionLocal()
+    try:
+        doc_record = db.query(Document).filter(Document.id == doc_id).first()
+        if not doc_record or doc_record.generation != generation:
+            return 0  # Superseded by a newer run
+        if doc_record.status == "Failed":
+            return 0  # Another batch (or the chunking stream) already failed this run
+
+        written = db.query(DocumentChunk.id).filter(
+            DocumentChunk.document_id == doc_id,
+            DocumentChunk.generation == generation,
+            DocumentChunk.ordinal == batch[0][0]
+        ).first()
+        if written:
+            print(f"⏭️ Doc {doc_id}: batch at chunk {batch[0][0]} already written (redelivery)")
+            return len(batch)
+
+        started_at = time.perf_counter()
+        vectors = generate_embeddings([chunk_text for _, chunk_text, _ in batch])
+        if vectors is None:
+            raise RuntimeError("Embedding generation failed")
+
+        # One bulk write per batch (COPY / executemany) instead of one INSERT per chunk
+        bulk_insert_chunks(db, [
+            {
+                "document_id": doc_record.id,
+                "company_id": doc_record.company_id,
+                "ordinal": ordinal,
+                "generation": generation,
+                "ready": False,
+                "content": chunk_text,
+                "content_hash": content_hash,
+                "embedding": embedding_vector,
+            }
+            for (ordinal, chunk_text, content_hash), embedding_vector in zip(batch, vectors)
+        ])
+        # Atomic progress counter (batches of the same document commit concurrently).
+        # Only while this run is current: a restarted run resets the counters finalize waits on.
+        progress = db.execute(
+            update(Document)
+            .where(Document.id == doc_id, Document.generation == generation)
+            .values(chunks_done=Document.chunks_done + len(batch))
+            .returning(Document.chunks_done, Document.chunks_total)
+        ).one_or_none()
+        if progress is None:
+            db.rollback()
+            return 0
+        chunks_done, chunks_total = progress
+        db.commit()
+        publish_document(doc_id, doc_record.company_id, status="Embedding",
+                         chunks_done=chunks_done, chunks_total=chunks_total)
+
+        elapsed = time.perf_counter() - started_at
+        print(f"⚡ Doc {doc_id}: embedded {len(batch)} chunks in {elapsed:.2f}s "
+              f"({len(batch) / elapsed if elapsed else 0:.1f} chunks/sec)")
+        return len(batch)
+    except IntegrityError:
+        # The same batch committed concurrently by a second delivery
+        db.rollback()
+        return len(batch)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@celery_app.task(name="finalize_document_task", bind=True, ignore_result=True, acks_late=True, max_retries=None)
+def finalize_document_task(self, doc_id: int, generation: int, chunk_count: int, stale_ids: list,
+                           kept_chunks: list):
+    """
+    Queued when chunking ends. Re-queues itself until every dispatched batch is embedded, then,
+    in one transaction: publishes this run's chunks, removes stale ones, moves kept ones to
+    their new position / generation and marks the document Ready.
+    """
+    db = SessionLocal()
+    try:
+        doc_record = db.query(Document).filter(Document.id == doc_id).with_for_update().first()
+        if not doc_record:
+            return "Document not found in DB"
+        if doc_record.generation != generation:
+            db.rollback()
+            _delete_unpublished_chunks(doc_id, generation)
+            return "Superseded"
+        if doc_record.status == "Failed":
+            # A batch failed; its errback already cleaned up
+            db.rollback()
+            return "Failed"
+        if doc_record.chunks_done < doc_record.chunks_total:
+            db.rollback()
+            raise self.retry(countdown=settings.INGEST_FINALIZE_POLL_SECONDS)
+
+        # Readers see either the old version or the new one, never a mix of both
+        if stale_ids:
+            db.query(DocumentChunk).filter(DocumentChunk.id.in_(stale_ids)).delete(synchronize_session=False)
+        if kept_chunks:
+            db.execute(update(DocumentChunk), [{**chunk, "generation": generation} for chunk in kept_chunks])
+        db.query(DocumentChunk).filter(
+            DocumentChunk.document_id == doc_id, DocumentChunk.generation == generation
+        ).update({"ready": True}, synchronize_session=False)
+
+        doc_record.chunk_count = chunk_count
+        doc_record.status = "Ready"
+        db.commit()
+        publish_document(doc_id, doc_record.company_id, status="Ready", chunk_count=chunk_count)
+        print(f"✅ Document {doc_id} processed and indexed successfully!")
+
+        # Company knowledge base changed -> cached chat answers may be stale
+        if doc_record.chunks_total or stale_ids:
+            invalidate_company_answers(doc_record.company_id)
+        return "Success"
+    except Retry:
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error in finalize_document_task: {e}")
+        _delete_unpublished_chunks(doc_id, generation)
+        _mark_document_failed(doc_id, str(e))
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
+@celery_app.task(name="document_pipeline_failed_task", ignore_result=True)
+def document_pipeline_failed_task(request, exc, traceback, doc_id: int = None, generation: int = None):
+    """
+    Errback of every embedding batch: any failed batch marks the document Failed and drops the
+    chunks this run already wrote (the previous version, if any, stays searchable).
+    """
+    print(f"❌ Ingestion pipeline failed for document {doc_id}: {exc}")
+    _delete_unpublished_chunks(doc_id, generation)
+    _mark_document_failed(doc_id, str(exc))
+
 # TASK 2: ATS RESUME SCANNER (The "Brain")
-@celery_app.task(name="scan_resume_task")
-def scan_resume_task(application_id: int, file_path: str):
+#
+#   scan_resume_task (ingest-cpu)            candidate profile (parse + embed once per file) -> instant pre-score
+#   prescore_applications_task (ingest-cpu)  same, for apply-all fan-out of an existing profile
+#        |  only top-K / above threshold
+#   llm_score_application_task (llm)         Groq scoring on the profile summary
+@celery_app.task(name="scan_resume_task", ignore_result=True, acks_late=True)
+def scan_resume_task(application_id: int, blob_key: str, file_hash: str):
     """
-    1. Reads Candidate Resume.
-    2. Fetches Job Description.
-    3. Asks Groq AI to score it.
-    4. Updates Application Status.
+    1. Finds / creates the candidate profile (resume parsed & embedded once per file).
+    2. Computes the cosine pre-score against the Job Description.
+    3. Sends only promising candidates to the LLM scorer.
     """
     print(f"🕵️ Scanning Application ID: {application_id}")
     db = SessionLocal()
@@ -110,52 +428,300 @@ def scan_resume_task(application_id: int, file_path: str):
         if not job:
             return "Job Description not found"
 
-        # 1. Read Resume Text
-        resume_text = extract_text_from_file(file_path)
+        # 1. Profile: same email + same file -> no re-parse, no re-embed (the blob isn't even downloaded)
+        # Bulk imports without a manifest row: contact email comes from the resume itself
+        resume_text = None
+        if not application.candidate_email:
+            resume_text = extract_text_from_blob(blob_key)
+            application.candidate_email = find_email(resume_text) or ""
+
+        profile = get_or_create_profile(
+            db, job.company_id, application.candidate_email, application.candidate_name, file_hash, blob_key,
+            resume_text=resume_text
+        )
+        application.profile_id = profile.id
+        db.commit()
+
+        # 2 + 3. Pre-score and route
+        _prescore_and_route(db, application, job, profile)
         
-        # 2. Save text to DB (so HR can read it later)
-        application.resume_text = resume_text 
+        return "Success"
+
+    except Exception as e:
+        print(f"❌ Error in scan_resume_task: {e}")
+        # Don't leave it "Scanning..." forever (bulk import progress counts on this)
+        db.rollback()
+        db.execute(update(Application).where(Application.id == application_id).values(status="Scan Failed"))
         db.commit()
+        application = db.query(Application).filter(Application.id == application_id).first()
+        if application:
+            publish_application(application, application.job.company_id)
+            # This may have been the job's last pending scan: the others wait for the top-K ranking
+            _route_top_k(db, application.job)
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+        # Cleanup (the profile keeps the text, the file itself is no longer needed)
+        delete_blobs([blob_key])
 
-        # 3. AI Analysis (Groq)
-        ai_result = analyze_resume(resume_text, job.description)
+@celery_app.task(name="prescore_applications_task", ignore_result=True, acks_late=True)
+def prescore_applications_task(application_ids: list):
+    """Fan-out: pre-scores applications whose profile already exists (no file to parse)."""
+    db = SessionLocal()
+
+    try:
+        applications = db.query(Application).filter(Application.id.in_(application_ids)).all()
+        for application in applications:
+            job = db.query(Job).filter(Job.id == application.job_id).first()
+            if job and application.profile:
+                _prescore_and_route(db, application, job, application.profile)
+        return "Success"
+
+    except Exception as e:
+        print(f"❌ Error in prescore_applications_task: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
+@celery_app.task(name="source_talent_pool_task", ignore_result=True, acks_late=True)
+def source_talent_pool_task(job_id: int, top_n: int):
+    """Reverse matching: the top N past candidates become "Sourced" applications and get LLM-scored."""
+    db = SessionLocal()
+
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            return "Job not found"
+
+        matches = search_talent_pool(db, job, top_n)
+        applications = [
+            Application(
+                candidate_name=match["candidate_name"],
+                candidate_email=match["candidate_email"],
+                job_id=job.id,
+                profile_id=match["profile_id"],
+                pre_score=match["similarity"],
+                status="Sourced",
+                match_score=None
+            )
+            for match in matches
+        ]
+        db.add_all(applications)
+        db.commit()
+
+        for application in applications:
+            apply_skill_gap(db, application, job, application.profile)
+            publish_application(application, job.company_id)
+
+        if applications:
+            group(llm_score_application_task.s(application.id) for application in applications).apply_async()
+        print(f"🧲 Sourced {len(applications)} candidates for job {job_id}")
+        return "Success"
+
+    except Exception as e:
+        print(f"❌ Error in source_talent_pool_task: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
+@celery_app.task(name="backfill_candidate_profiles_task", ignore_result=True)
+def backfill_candidate_profiles_task(company_id: int):
+    """One-off: builds talent-pool profiles for applications scanned before profiles existed."""
+    db = SessionLocal()
+    try:
+        created = backfill_profiles_from_applications(db, company_id)
+        print(f"🗂️ Backfilled {created} candidate profiles for company {company_id}")
+        return "Success"
+    except Exception as e:
+        print(f"❌ Error in backfill_candidate_profiles_task: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
+def _prescore_and_route(db: Session, application: Application, job: Job, profile):
+    # Instant pre-score + skill gap (no network call)
+    apply_skill_gap(db, application, job, profile)
+    job_vector = ensure_job_embedding(db, job)
+    application.resume_embedding = profile.embedding
+    if profile.embedding is not None and job_vector is not None:
+        application.pre_score = similarity_score(profile.embedding, job_vector)
+    else:
+        application.pre_score = 0.0
+    db.commit()
+
+    # Expensive LLM scoring only for the top candidates
+    if above_llm_threshold(application, job):
+        application.status = "Scoring..."
+        db.commit()
+        llm_score_application_task.delay(application.id)
+    else:
+        application.match_score = None
+        application.ai_feedback = "Pre-screened by semantic similarity; not selected for AI scoring."
+        application.status = "Pre-Screened"
+        db.commit()
+    publish_application(application, job.company_id)
+    print(f"📐 Pre-score: {application.pre_score}/100 ({application.status})")
+
+    # Top-K is decided once the job's pending scans have settled, over all applicants
+    _route_top_k(db, job)
+
+def _route_top_k(db: Session, job: Job):
+    for selected in select_top_k_for_llm(db, job):
+        llm_score_application_task.delay(selected.id)
+        publish_application(selected, job.company_id)
+
+@celery_app.task(name="llm_score_application_task", bind=True, ignore_result=True, acks_late=True, max_retries=3)
+def llm_score_application_task(self, application_id: int):
+    """Asks Groq AI to score the candidate profile against the Job Description."""
+    db = SessionLocal()
+
+    try:
+        application = db.query(Application).filter(Application.id == application_id).first()
+        if not application:
+            return "Application not found"
+        job = db.query(Job).filter(Job.id == application.job_id).first()
+        if not job:
+            return "Job Description not found"
+
+        # Compact structured profile (summarized once) instead of the full resume per job
+        # Applications scanned before profiles existed still carry their own resume_text
+        if application.profile:
+            candidate_text = profile_prompt_text(db, application.profile)
+        else:
+            candidate_text = application.resume_text or ""
+        if not candidate_text.strip():
+            application.match_score = None
+            application.ai_feedback = "AI scoring failed: no resume text"
+            application.status = "Scan Failed"
+            db.commit()
+            publish_application(application, job.company_id)
+            return "No resume text"
+
+        # AI Analysis (Groq, or the score cache for an identical prompt), told what the local skill matcher already found
+        skill_hints = None
+        if application.matched_skills is not None:
+            skill_hints = {"matched": application.matched_skills, "missing": application.missing_skills}
+        ai_result = cached_analyze_resume(db, job.company_id, candidate_text, job.description, skill_hints)
+
+        # A failed call (e.g. still rate limited after backoff) must not look like a score of 0
+        if "error" in ai_result:
+            if self.request.retries < self.max_retries:
+                raise self.retry(countdown=60 * (2 ** self.request.retries))
+            application.match_score = None
+            application.ai_feedback = f"AI scoring failed: {ai_result['error']}"
+            application.status = "Scan Failed"
+            db.commit()
+            publish_application(application, job.company_id)
+            return "Scoring failed"
         
-        # 4. Save Score & Feedback
+        # Save Score & Feedback
         application.match_score = ai_result.get("score", 0)
         application.ai_feedback = ai_result.get("summary", "No summary provided.")
+        application.missing_skills = merge_missing_skills(application.missing_skills, ai_result.get("missing_skills"))
         application.status = "Reviewed"
         
         db.commit()
+        publish_application(application, job.company_id)
         print(f"✅ Resume Scored: {application.match_score}/100")
-        
-        # Cleanup
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        return "Success"
+
+    except Retry:
+        raise
+    except Exception as e:
+        print(f"❌ Error in llm_score_application_task: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
+
+# TASK 5: LEAVE TRIAGE (only requests the company's leave rules couldn't decide)
+@celery_app.task(name="triage_leave_task", ignore_result=True, acks_late=True)
+def triage_leave_task(leave_id: int):
+    """Asks Groq AI for a recommendation; auto-approves only if HR hasn't acted meanwhile."""
+    db = SessionLocal()
+
+    try:
+        leave = db.query(LeaveRequest).filter(LeaveRequest.id == leave_id).first()
+        if not leave:
+            return "Leave request not found"
+
+        ai_result = analyze_leave(leave.reason, leave.days_count)
+        recommendation = ai_result.get("recommendation", "Human-Review")
+
+        leave.ai_recommendation = recommendation
+        leave.ai_reason = ai_result.get("reason", "Needs manual check")
+        db.flush()
+
+        if recommendation == "Auto-Approve":
+            # Only a still-Pending leave is approved: an HR decision taken while the AI was thinking wins
+            approved = db.execute(
+                update(LeaveRequest)
+                .where(LeaveRequest.id == leave_id, LeaveRequest.status == "Pending")
+                .values(status="Approved")
+                .returning(LeaveRequest.id)
+            ).first()
+            if approved:
+                record_status_change(db, leave.user_id, leave.days_count, leave.start_date,
+                                     "Pending", "Approved", leave.created_at)
+        db.commit()
+        print(f"🗓️ Leave {leave_id} triaged: {recommendation}")
+        return "Success"
 
+    except Exception as e:
+        print(f"❌ Error in triage_leave_task: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
+
+@celery_app.task(name="rebuild_leave_balances_task", ignore_result=True)
+def rebuild_leave_balances_task(company_id: int = None):
+    """Consistency job: recomputes the leave balance ledger (one company, or all when None)."""
+    db = SessionLocal()
+    try:
+        rows = rebuild_balances(db, company_id)
+        print(f"🧮 Rebuilt {rows} leave balance rows (company {company_id or 'all'})")
         return "Success"
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error in rebuild_leave_balances_task: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        db.close()
+
 
+@celery_app.task(name="purge_score_cache_task", ignore_result=True)
+def purge_score_cache_task():
+    """Periodic (celery beat): deletes expired AI score cache rows of every company."""
+    db = SessionLocal()
+    try:
+        deleted = purge_expired(db)
+        print(f"🧹 Purged {deleted} expired score cache entries")
+        return "Success"
     except Exception as e:
-        print(f"❌ Error in scan_resume_task: {e}")
+        db.rollback()
+        print(f"❌ Error in purge_score_cache_task: {e}")
         return f"Error: {str(e)}"
     finally:
         db.close()
 
 
 # TASK 3 & 4: UTILS (Meeting & Email)
-@celery_app.task(name="schedule_meeting_task")
+@celery_app.task(name="schedule_meeting_task", ignore_result=True)
 def schedule_meeting_task(summary, start_time, end_time, emails):
     print(f"📅 Scheduling: {summary}")
     return create_meeting_event(summary, start_time, end_time, emails)
 
-@celery_app.task(name="send_email_task")
-def send_email_task(recipients, subject, body, file_paths=None):
+@celery_app.task(name="send_email_task", ignore_result=True)
+def send_email_task(recipients, subject, body, attachment_keys=None):
     print(f"✉️ Sending email to {len(recipients)} recipients...")
-    success = send_google_email(recipients, subject, body, file_paths)
+    store = get_blob_store()
+    with ExitStack() as stack:
+        # Gmail client needs real files: fetch each attachment from the blob store
+        file_paths = [stack.enter_context(store.local_copy(key)) for key in attachment_keys or []]
+        success = send_google_email(recipients, subject, body, file_paths)
     
-    # Cleanup attachments if they were temp files
-    if file_paths:
-        for path in file_paths:
-            if os.path.exists(path):
-                os.remove(path)
+    # Cleanup attachments (they were only uploaded for this email)
+    delete_blobs(attachment_keys)
                 
     return "Sent" if success else "Failed"
\ No newline at end of file
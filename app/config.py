@@ -17,6 +17,104 @@ class Settings(BaseSettings):
 
     # AI Keys
     GROQ_API_KEY: str | None = None
+
+    # Groq Rate Limiting (shared by all processes through Redis)
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 6000
+    GROQ_EST_OUTPUT_TOKENS: int = 512
+    GROQ_BATCH_RESERVE: float = 0.2     # share of each bucket batch (ATS) calls may not use
+    GROQ_INTERACTIVE_MAX_WAIT_SECONDS: float = 20
+    GROQ_BATCH_MAX_WAIT_SECONDS: float = 600
+    GROQ_MAX_RETRIES: int = 5
+    GROQ_BACKOFF_BASE_SECONDS: float = 1.0
+    GROQ_BACKOFF_MAX_SECONDS: float = 60.0
+
+    # Embeddings (chunks per forward pass during document ingestion)
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 32
+    # True only for models with an uncased tokenizer: the embedding cache then ignores letter case
+    EMBEDDING_MODEL_UNCASED: bool = True
+    # Load the model at process start (set False for email/calendar-only workers)
+    EMBEDDING_WARMUP: bool = True
+    # Torch intra-op threads (0 = cores / worker concurrency, set by the Celery worker)
+    TORCH_NUM_THREADS: int = 0
+    # Threads used to run embedding off the event loop in async endpoints
+    EMBEDDING_EXECUTOR_WORKERS: int = 2
+
+    # Embedding Cache (in-process LRU + shared Redis tier)
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    EMBEDDING_CACHE_USE_REDIS: bool = True
+
+    # Chunking (in embedding-model tokens; all-MiniLM-L6-v2 window is 256 incl. special tokens)
+    CHUNK_MAX_TOKENS: int = 240
+    CHUNK_OVERLAP_TOKENS: int = 32
+
+    # PDF extraction: process pool for large PDFs (needs a non-daemonic worker, e.g. --pool=threads/solo)
+    PDF_EXTRACT_PROCESSES: int = 0
+    PDF_PARALLEL_MIN_PAGES: int = 50
+    PDF_PAGES_PER_TASK: int = 8
+
+    # Chunks per embedding task when a document is fanned out across workers
+    INGEST_TASK_BATCH_SIZE: int = 128
+    # How often finalize re-checks whether every dispatched batch has been embedded
+    INGEST_FINALIZE_POLL_SECONDS: int = 5
+
+    # Chunk writes during ingestion: "copy" (binary COPY, psycopg2) or "executemany"
+    CHUNK_WRITE_MODE: str = "copy"
+
+    # Vector Search (pgvector ANN index)
+    VECTOR_DISTANCE: str = "cosine"          # cosine | inner_product | l2
+    VECTOR_INDEX_TYPE: str = "hnsw"          # hnsw | ivfflat
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40
+    IVFFLAT_LISTS: int = 100
+    IVFFLAT_PROBES: int = 10
+    # "relaxed_order" / "strict_order" / "off": iterative scans (pgvector >= 0.8) keep tenant-filtered
+    # results complete; older pgvector (or "off") falls back to an exact scan when the index comes back short
+    VECTOR_ITERATIVE_SCAN: str = "relaxed_order"
+    # Create / repair tables, migrations and ANN indexes when the API starts (else run `python -m app.db_setup`)
+    DB_SETUP_ON_STARTUP: bool = True
+
+    # ATS Pre-Ranking: LLM scoring only for the top-K applicants by embedding pre-score
+    # and/or those with pre-score >= ATS_LLM_MIN_PRESCORE (per-job values override these).
+    # Top-K is ranked once a job's pending scans settle: a bulk import costs K calls; each later
+    # applicant at most one more, and only when it ranks inside the top-K of everyone so far.
+    ATS_LLM_TOP_K: int = 25
+    ATS_LLM_MIN_PRESCORE: float | None = None
+    # Talent pool (reverse matching of past candidates against a new job)
+    TALENT_POOL_DEFAULT_LIMIT: int = 20
+    TALENT_POOL_MAX_LIMIT: int = 200
+    # Candidate profile summaries (LLM): a claimed summary is retried after the lease if the worker died,
+    # a failed one after PROFILE_SUMMARY_RETRY_MINUTES * 2^(attempts-1) (max 24h)
+    PROFILE_SUMMARY_LEASE_MINUTES: int = 15
+    PROFILE_SUMMARY_RETRY_MINUTES: int = 30
+    # ATS Score Cache (persistent, keyed by model + prompt version + candidate/JD hashes)
+    SCORE_CACHE_ENABLED: bool = True
+    SCORE_CACHE_TTL_DAYS: int = 30
+
+    # Bulk resume import (ZIP or files + CSV manifest)
+    BULK_IMPORT_MAX_FILES: int = 2000
+    BULK_IMPORT_MAX_FILE_MB: int = 10
+
+    # Blob Store for uploads (API and workers only exchange keys, never local paths)
+    # "local": BLOB_LOCAL_DIR (must be a shared mount when API and workers run on different nodes)
+    # "s3": any S3-compatible store (AWS, MinIO, R2...), needs boto3
+    BLOB_BACKEND: str = "local"
+    BLOB_LOCAL_DIR: str = "blob_store"
+    S3_BUCKET: str | None = None
+    S3_ENDPOINT_URL: str | None = None
+    S3_REGION: str | None = None
+    S3_ACCESS_KEY_ID: str | None = None
+    S3_SECRET_ACCESS_KEY: str | None = None
+    MAX_UPLOAD_MB: int = 25
+
+    # Semantic Answer Cache (per company, invalidated when its documents change)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES: int = 500
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 3600
     
     # Google Keys (Paths to JSON files)
     GOOGLE_TOKEN_PATH: str = "token.json"
@@ -0,0 +1,169 @@
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from app.database import Base, SessionLocal, engine
+from app.services.leave_balance import backfill_once
+from app.services.vector_search import ensure_vector_indexes
+import app.models  # noqa: F401 (registers every table on Base.metadata)
+
+# Database setup: tables, migrations, one-time data backfills and ANN indexes.
+# Idempotent, so it can run on every deploy.
+# Runs once per API process on startup (DB_SETUP_ON_STARTUP) or explicitly:
+#     python -m app.db_setup
+# Postgres advisory locks make sure only one process does each step at a time,
+# however many uvicorn workers start together.
+
+SCHEMA_LOCK_ID = 7_310_001
+INDEX_LOCK_ID = 7_310_002
+
+
+def _autocommit_connection():
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _column_ddl(conn, column) -> str:
+    ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg.compile(dialect=conn.dialect)}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+        if fk.ondelete:
+            ddl += f" ON DELETE {fk.ondelete}"
+    return ddl
+
+
+def add_missing_columns(conn):
+    """
+    create_all() never ALTERs an existing table, so columns added to a model later
+    (documents.status, applications.profile_id, ...) are added here, with their indexes.
+    New columns are nullable / defaulted, so this is safe on tables with rows.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                print(f"🛠️ Adding column {table.name}.{column.name}")
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {_column_ddl(conn, column)}"))
+        # Only missing indexes: CREATE INDEX locks the table even when IF NOT EXISTS skips it
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def add_missing_unique_constraints(conn):
+    """Unique constraints added to an existing table's model (create_all skips those too)."""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing:
+                columns = ", ".join(column.name for column in constraint.columns)
+                try:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD CONSTRAINT {constraint.name} UNIQUE ({columns})"))
+                    print(f"🛠️ Added unique constraint {constraint.name}")
+                except Exception as e:
+                    print(f"⚠️ Could not add unique constraint {constraint.name}: {e}")
+
+
+def dedupe_document_chunks(conn):
+    """Redelivered embedding batches could insert a chunk twice before uq_document_chunk_position existed."""
+    removed = conn.execute(text("""
+        DELETE FROM document_chunks c USING document_chunks d
+        WHERE c.document_id = d.document_id AND c.generation = d.generation
+          AND c.ordinal = d.ordinal AND c.id > d.id
+    """)).rowcount
+    if removed:
+        print(f"🧹 Removed {removed} duplicate document chunks")
+
+
+def migrate_legacy_documents(conn):
+    """
+    Before document_chunks existed, every chunk was a documents row with its own content +
+    embedding ("Policy.pdf (Part 2)" ...). Those rows become a document with one chunk each,
+    so existing knowledge bases stay searchable without re-uploading. The old columns are
+    kept (unmapped) and only rows that have no chunks yet are copied, so this runs once.
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("documents")}
+    if not {"content", "embedding"} <= columns:
+        return
+    copied = conn.execute(text("""
+        INSERT INTO document_chunks (document_id, ordinal, content, content_hash, embedding, company_id)
+        SELECT d.id, 0, d.content, encode(sha256(convert_to(d.content, 'UTF8')), 'hex'), d.embedding, d.company_id
+        FROM documents d
+        WHERE d.embedding IS NOT NULL AND d.status IS NULL
+          AND NOT EXISTS (SELECT 1 FROM document_chunks c WHERE c.document_id = d.id)
+    """)).rowcount
+    conn.execute(text("""
+        UPDATE documents d SET
+            status = CASE WHEN EXISTS (SELECT 1 FROM document_chunks c WHERE c.document_id = d.id)
+                          THEN 'Ready' ELSE 'Failed' END,
+            chunk_count = (SELECT count(*) FROM document_chunks c WHERE c.document_id = d.id),
+            chunks_total = 0, chunks_done = 0,
+            error = CASE WHEN EXISTS (SELECT 1 FROM document_chunks c WHERE c.document_id = d.id)
+                         THEN NULL ELSE 'Uploaded before chunked storage without text, please re-upload' END
+        WHERE d.status IS NULL
+    """))
+    if copied:
+        print(f"📦 Moved {copied} legacy document rows into document_chunks")
+
+
+def ensure_schema():
+    """Creates missing tables / columns and migrates old data. Blocks while another process runs it."""
+    with _autocommit_connection() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+        try:
+            Base.metadata.create_all(bind=conn)
+            add_missing_columns(conn)
+            dedupe_document_chunks(conn)
+            add_missing_unique_constraints(conn)
+            migrate_legacy_documents(conn)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+
+
+def build_indexes(wait: bool = False) -> bool:
+    """
+    Builds / repairs the vector indexes. wait=False (startup): skipped when another
+    process is already building them. Returns False when skipped.
+    """
+    with _autocommit_connection() as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": INDEX_LOCK_ID})
+        elif not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": INDEX_LOCK_ID}).scalar():
+            print("⏭️ Vector indexes are being built by another process")
+            return False
+        try:
+            ensure_vector_indexes(conn)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": INDEX_LOCK_ID})
+    print("✅ Vector indexes ready")
+    return True
+
+
+def backfill_data():
+    """
+    One-time backfills of tables introduced after data already existed. Each is guarded by its
+    own lock and recorded in data_migrations once done, so it runs exactly once per database.
+    """
+    with SessionLocal() as db:
+        backfill_once(db)
+
+
+def run_db_setup():
+    ensure_schema()
+    backfill_data()
+    build_indexes(wait=True)
+
+
+if __name__ == "__main__":
+    run_db_setup()
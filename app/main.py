@@ -1,12 +1,15 @@
 import os
+import asyncio
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.config import settings
-from app.database import engine, Base
+from app.db_setup import backfill_data, build_indexes, ensure_schema
+from app.services.ai_service import get_embedding_cache_stats, warm_up_models, is_embedding_model_loaded
 
 import app.models 
-from app.routers import auth, ats, documents, chat, employees, leaves, company, tools
+from app.routers import auth, ats, documents, chat, employees, leaves, company, tools, events
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -21,9 +24,40 @@ templates_path = os.path.join(os.path.dirname(__file__), "templates")
 templates = Jinja2Templates(directory=templates_path)
 
 # --- 3. Create Database Tables ---
-Base.metadata.create_all(bind=engine)
-
-# --- 4. Register API Routers ---
+# Tables before the first request; ANN indexes in the background (CONCURRENTLY, may take minutes).
+# Not done at import time, so Celery workers / scripts importing the app don't touch the schema.
+def _on_index_build_done(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"❌ Vector index build failed: {future.exception()}")
+
+@app.on_event("startup")
+async def set_up_database():
+    if settings.DB_SETUP_ON_STARTUP:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, ensure_schema)
+        await loop.run_in_executor(None, backfill_data)
+        loop.run_in_executor(None, build_indexes).add_done_callback(_on_index_build_done)
+
+# --- 4. Warm Up AI Models ---
+# Runs in the background so the server accepts traffic immediately; /ready reports when the model is loaded.
+_warmup_error = None
+
+def _on_warm_up_done(future):
+    global _warmup_error
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        _warmup_error = f"{type(error).__name__}: {error}"
+        print(f"❌ AI model warm-up failed: {_warmup_error}")
+
+@app.on_event("startup")
+async def warm_up_on_startup():
+    if settings.EMBEDDING_WARMUP:
+        future = asyncio.get_running_loop().run_in_executor(None, warm_up_models)
+        future.add_done_callback(_on_warm_up_done)
+
+# --- 5. Register API Routers ---
 app.include_router(auth.router, prefix="/api", tags=["Auth"])
 app.include_router(ats.router, prefix="/api/ats", tags=["ATS"])
 app.include_router(documents.router, prefix="/api/documents", tags=["Documents"])
@@ -32,8 +66,9 @@ app.include_router(employees.router, prefix="/api/employees", tags=["Employees"]
 app.include_router(leaves.router, prefix="/api/leaves", tags=["Leaves"])
 app.include_router(company.router, prefix="/api/company", tags=["Company"])
 app.include_router(tools.router, prefix="/api/tools", tags=["Tools"]) 
+app.include_router(events.router, prefix="/api/events", tags=["Events"])
 
-# 5. FRONTEND ROUTES (HTML Pages)
+# 6. FRONTEND ROUTES (HTML Pages)
 
 # 🏠 Main Entry Point (Landing Page)
 @app.get("/")
@@ -93,6 +128,20 @@ async def create_agent_page(request: Request):
 def health_check():
     return {"status": "ok"}
 
+# --- Readiness Check (used by load balancer during rolling restarts) ---
+@app.get("/ready")
+def readiness_check():
+    model_loaded = is_embedding_model_loaded()
+    ready = model_loaded or not settings.EMBEDDING_WARMUP
+    content = {"status": "ready" if ready else "warming_up", "embedding_model_loaded": model_loaded}
+    if not ready and _warmup_error:
+        content.update(status="warm_up_failed", error=_warmup_error)
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+@app.get("/health/embedding-cache")
+def embedding_cache_stats():
+    return get_embedding_cache_stats()
+
 @app.get("/admin/leave-requests")
 async def admin_leaves_page(request: Request):
     return templates.TemplateResponse("admin_leaves.html", {"request": request})
\ No newline at end of file
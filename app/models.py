@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, JSON, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, JSON, Float, UniqueConstraint, text
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector 
 from app.database import Base
@@ -12,6 +12,7 @@ class Company(Base):
     name = Column(String, unique=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     yearly_leaves = Column(Integer, default=20)
+    leave_rules = Column(JSON)  # Overrides of leave_rules.DEFAULT_LEAVE_RULES (NULL -> defaults)
     # Relationships
     users = relationship("User", back_populates="company")
     jobs = relationship("Job", back_populates="company")
@@ -48,18 +49,49 @@ class Agent(Base):
     conversations = relationship("Conversation", back_populates="agent")
 
 # --- 4. RAG DOCUMENTS (Policy PDFs) ---
+# One row per uploaded file (metadata only). The searchable text lives in document_chunks.
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String)
-    content = Column(Text)  # Extracted text
+    status = Column(String, default="Processing")  # Processing, Embedding, Ready, Failed
+    file_hash = Column(String(64), index=True)  # sha256 of the uploaded file
+    chunk_count = Column(Integer, default=0)
+    # Ingestion progress (chunks to embed / embedded so far) & last failure reason
+    chunks_total = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    error = Column(Text)
+    # Incremented by every ingestion run; that run's new chunks carry it until finalize publishes them
+    generation = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    company_id = Column(Integer, ForeignKey("companies.id"), index=True)
+    company = relationship("Company", back_populates="documents")
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+    # A redelivered embedding batch can't insert the same chunk twice
+    __table_args__ = (UniqueConstraint("document_id", "generation", "ordinal", name="uq_document_chunk_position"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True)
+    ordinal = Column(Integer)  # Position of the chunk inside the file
+    content = Column(Text)
+    content_hash = Column(String(64))  # sha256 of content (re-uploads only re-embed changed chunks)
+    # New chunks are written with ready=False and only become searchable when the whole
+    # document is indexed (finalize_document_task swaps them in, together with the stale deletes)
+    generation = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    ready = Column(Boolean, nullable=False, default=True, server_default=text("true"))
     
-    #  Stores the vector embedding (1536 dimensions for standard models)
+    #  Stores the vector embedding (384 dimensions for all-MiniLM-L6-v2)
     embedding = Column(Vector(384)) 
     
-    company_id = Column(Integer, ForeignKey("companies.id"))
-    company = relationship("Company", back_populates="documents")
+    # Denormalized tenant column: retrieval filters chunks without joining documents
+    # (ANN index is managed in services/vector_search.py)
+    company_id = Column(Integer, ForeignKey("companies.id"), index=True)
+    document = relationship("Document", back_populates="chunks")
 
 # --- 5. ATS SYSTEM (Jobs & Resumes) ---
 class Job(Base):
@@ -70,6 +102,12 @@ class Job(Base):
     description = Column(Text)
     location = Column(String)
     status = Column(String, default="Open")
+
+    # Pre-ranking: JD embedding + which applicants get the (expensive) LLM scoring
+    embedding = deferred(Column(Vector(384)))
+    llm_top_k = Column(Integer)          # NULL -> settings.ATS_LLM_TOP_K
+    llm_min_prescore = Column(Float)     # NULL -> settings.ATS_LLM_MIN_PRESCORE
+    required_skills = Column(JSON)       # Canonical skills found in the JD (skill_service)
     
     company_id = Column(Integer, ForeignKey("companies.id"))
     company = relationship("Company", back_populates="jobs")
@@ -83,14 +121,70 @@ class Application(Base):
     candidate_email = Column(String)
     resume_text = Column(Text)  # Text extracted from PDF
     
+    # Instant pre-score: cosine(resume embedding, JD embedding) * 100
+    resume_embedding = deferred(Column(Vector(384)))
+    pre_score = Column(Float)
+    # Local skill gap vs the JD (LLM-only findings are merged into missing_skills)
+    matched_skills = Column(JSON)
+    missing_skills = Column(JSON)
+
     # AI Scoring
     match_score = Column(Float)  # e.g., 85.5
     ai_feedback = Column(Text)   # "Good skill match, lacks experience"
-    status = Column(String, default="Applied") # Applied, Interview, Hired, Rejected
+    status = Column(String, default="Applied") # Applied, Pre-Screened, Interview, Hired, Rejected
     
-    job_id = Column(Integer, ForeignKey("jobs.id"))
+    job_id = Column(Integer, ForeignKey("jobs.id"), index=True)
     job = relationship("Job", back_populates="applications")
 
+    # Parsed once per (candidate, resume file) and shared by all their applications
+    profile_id = Column(Integer, ForeignKey("candidate_profiles.id"), index=True)
+    profile = relationship("CandidateProfile", back_populates="applications")
+
+    # Set when the resume came in through a bulk import
+    batch_id = Column(Integer, ForeignKey("import_batches.id"), index=True)
+
+class ScoreCache(Base):
+    """Persistent cache of analyze_resume results (identical prompt -> identical completion)."""
+    __tablename__ = "score_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256(company, model, prompt version, candidate hash, JD hash)
+    jd_hash = Column(String(64), index=True)     # explicit invalidation per job description
+    company_id = Column(Integer, ForeignKey("companies.id"), index=True)  # entries are never shared across tenants
+    result = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
+
+class ImportBatch(Base):
+    __tablename__ = "import_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String)  # Uploaded archive / manifest name
+    total = Column(Integer, default=0)
+    skipped = Column(JSON)   # [{"file": ..., "reason": ...}] entries that were not imported
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    job_id = Column(Integer, ForeignKey("jobs.id"), index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), index=True)
+
+class CandidateProfile(Base):
+    __tablename__ = "candidate_profiles"
+    __table_args__ = (UniqueConstraint("company_id", "email", "file_hash", name="uq_candidate_profile_file"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, index=True)
+    full_name = Column(String)
+    file_hash = Column(String(64))  # sha256 of the resume file
+    resume_text = Column(Text)
+    summary = Column(JSON)  # Structured LLM summary (skills, experience...), generated once
+    summary_attempts = Column(Integer, default=0)
+    summary_retry_at = Column(DateTime(timezone=True))  # Claim lease / failure backoff of the summary
+    skills = Column(JSON)   # Canonical skills found in the resume text (skill_service)
+    embedding = deferred(Column(Vector(384)))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    company_id = Column(Integer, ForeignKey("companies.id"), index=True)
+    applications = relationship("Application", back_populates="profile")
+
 # --- 6. CHAT HISTORY ---
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -136,4 +230,24 @@ class LeaveRequest(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     user = relationship("User", back_populates="leaves")
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class LeaveBalance(Base):
+    """
+    Approved leave per user and year, kept up to date whenever a leave enters or leaves
+    "Approved" (services/leave_balance.py). Dashboard stats are a primary-key read.
+    """
+    __tablename__ = "leave_balances"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    days_used = Column(Integer, default=0, nullable=False)
+    approved_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class DataMigration(Base):
+    """One row per one-time data migration / backfill that has completed (app/db_setup.py)."""
+    __tablename__ = "data_migrations"
+
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
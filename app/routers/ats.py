@@ -1,12 +1,23 @@
-import os
-import shutil
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+import zipfile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, status
+from fastapi.concurrency import run_in_threadpool
+from celery import group
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import Job, Application, User
+from app.models import Job, Application, CandidateProfile, ImportBatch, User
 from app.routers.auth import get_current_user  
-from app.celery_worker import scan_resume_task
+from app.celery_worker import (
+    scan_resume_task, llm_score_application_task, prescore_applications_task,
+    source_talent_pool_task, backfill_candidate_profiles_task
+)
+from app.services.ats_service import embed_long_text, search_talent_pool
+from app.services.skill_service import extract_skills
+from app.services.resume_import import stage_resumes
+from app.services.score_cache import get_score_cache_stats, invalidate_job_description
+from app.config import settings
+from app.services.storage import BlobTooLarge, save_upload
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -16,11 +27,50 @@ class JobCreate(BaseModel):
     title: str
     description: str
     location: str
+    # LLM scoring budget (None -> system defaults)
+    llm_top_k: Optional[int] = None
+    llm_min_prescore: Optional[float] = None
 
 class JobResponse(JobCreate):
     id: int
     company_id: int
     status: str
+    required_skills: Optional[List[str]] = None
+
+class JobScoringSettings(BaseModel):
+    llm_top_k: Optional[int] = None
+    llm_min_prescore: Optional[float] = None
+
+class ApplicantResponse(BaseModel):
+    id: int
+    candidate_name: Optional[str] = None
+    candidate_email: Optional[str] = None
+    pre_score: Optional[float] = None
+    match_score: Optional[float] = None
+    ai_feedback: Optional[str] = None
+    status: Optional[str] = None
+    job_id: int
+    profile_id: Optional[int] = None
+    matched_skills: Optional[List[str]] = None
+    missing_skills: Optional[List[str]] = None
+
+    class Config:
+        from_attributes = True
+
+class ImportProgress(BaseModel):
+    batch_id: int
+    job_id: int
+    total: int
+    processed: int
+    failed: int
+    by_status: dict
+    skipped: list
+
+class TalentMatch(BaseModel):
+    profile_id: int
+    candidate_name: Optional[str] = None
+    candidate_email: Optional[str] = None
+    similarity: float
 
 
 # 1. CREATE JOB POSTING (HR Only)
@@ -28,9 +78,11 @@ class JobResponse(JobCreate):
 @router.post("/jobs", response_model=JobResponse)
 def create_job(
     job_data: JobCreate,
+    source_top_n: int = Query(0, ge=0, le=settings.TALENT_POOL_MAX_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """source_top_n > 0: the best N past candidates are added as "Sourced" and AI-scored in the background."""
    
     # 1. Check if user belongs to a company
     if not current_user.company_id:
@@ -42,11 +94,20 @@ def create_job(
         description=job_data.description, # 🔥 AI isko use karega
         location=job_data.location,
         company_id=current_user.company_id,
-        status="Open"
+        status="Open",
+        llm_top_k=job_data.llm_top_k,
+        llm_min_prescore=job_data.llm_min_prescore,
+        required_skills=extract_skills(job_data.description),
+        # JD embedding for instant applicant pre-scores
+        embedding=embed_long_text(job_data.description)
     )
     db.add(new_job)
     db.commit()
     db.refresh(new_job)
+
+    # 3. Reverse matching from the talent pool (optional)
+    if source_top_n:
+        source_talent_pool_task.delay(new_job.id, source_top_n)
     
     return new_job
 
@@ -78,16 +139,14 @@ async def upload_resume(
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    # 1. Save File Temporarily
-    upload_dir = "temp_resumes"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Unique filename to avoid collision
-    safe_filename = f"{job_id}_{candidate_email}_{file.filename}"
-    file_path = os.path.join(upload_dir, safe_filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # 1. Stream file to the blob store (off the event loop)
+    # Hash computed while copying: same email + same file -> existing profile is reused
+    try:
+        blob_key, file_hash = await run_in_threadpool(
+            save_upload, file.file, f"resumes/{current_user.company_id}", file.filename
+        )
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
 
     # 2. Create Application Entry in DB (Initial Status: Pending)
     application = Application(
@@ -95,7 +154,7 @@ async def upload_resume(
         candidate_email=candidate_email,
         job_id=job.id,
         status="Scanning...", # ON UI USER SEE "Scanning..."
-        match_score=0.0
+        match_score=None # Filled by AI scoring (pre_score comes first)
     )
     db.add(application)
     db.commit()
@@ -103,7 +162,7 @@ async def upload_resume(
 
     # 3.  Trigger AI Celery Task
   
-    task = scan_resume_task.delay(application.id, file_path)
+    task = scan_resume_task.delay(application.id, blob_key, file_hash)
 
     return {
         "message": "Resume uploaded. AI analysis started.",
@@ -112,16 +171,136 @@ async def upload_resume(
     }
 
 
+# 3b. BULK APPLY (ZIP export or many files + CSV manifest)
+
+# Statuses that mean the scan pipeline is still working on an application
+_IN_PROGRESS_STATUSES = ("Scanning...", "Scoring...")
+
+@router.post("/jobs/{job_id}/apply/bulk")
+def bulk_upload_resumes(
+    job_id: int,
+    archive: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    manifest: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Imports many resumes in one request. Manifest (CSV: filename,name,email) is optional;
+    without it the name comes from the file name and the email from the resume text.
+    All applications are inserted in one statement and their scans enqueued as one group.
+    """
+    job = db.query(Job).filter(Job.id == job_id, Job.company_id == current_user.company_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if archive is None and not files:
+        raise HTTPException(status_code=400, detail="Upload a ZIP archive or resume files")
+
+    batch = ImportBatch(
+        job_id=job.id,
+        company_id=current_user.company_id,
+        source=archive.filename if archive is not None else (manifest.filename if manifest else "files"),
+        total=0
+    )
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+
+    # 1. Stream entries to the blob store (one file at a time, archive never loaded in memory)
+    try:
+        entries, skipped = stage_resumes(
+            f"resumes/{current_user.company_id}",
+            archive=archive.file if archive is not None else None,
+            files=files,
+            manifest=manifest.file if manifest else None
+        )
+    except zipfile.BadZipFile:
+        db.delete(batch)
+        db.commit()
+        raise HTTPException(status_code=400, detail="Invalid ZIP archive")
+
+    # 2. One batched INSERT ... RETURNING for all applications.
+    # insertmanyvalues batches don't return rows in parameter order unless asked to, and the ids
+    # are zipped with entries below (a mismatch would scan one candidate's resume under another's name)
+    application_ids = []
+    if entries:
+        application_ids = db.scalars(
+            insert(Application).returning(Application.id, sort_by_parameter_order=True),
+            [
+                {
+                    "candidate_name": entry["candidate_name"],
+                    "candidate_email": entry["candidate_email"],
+                    "job_id": job.id,
+                    "batch_id": batch.id,
+                    "status": "Scanning...",
+                }
+                for entry in entries
+            ]
+        ).all()
+
+    batch.total = len(application_ids)
+    batch.skipped = skipped
+    db.commit()
+
+    # 3. Enqueue all scans at once
+    if application_ids:
+        group(
+            scan_resume_task.s(application_id, entry["blob_key"], entry["file_hash"])
+            for application_id, entry in zip(application_ids, entries)
+        ).apply_async()
+
+    return {
+        "message": f"{len(application_ids)} resumes queued for AI analysis.",
+        "batch_id": batch.id,
+        "total": len(application_ids),
+        "skipped": skipped
+    }
+
+@router.get("/jobs/{job_id}/imports/{batch_id}", response_model=ImportProgress)
+def get_import_progress(
+    job_id: int,
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Aggregate progress of a bulk import (one GROUP BY, no per-application rows)."""
+    batch = db.query(ImportBatch).filter(
+        ImportBatch.id == batch_id,
+        ImportBatch.job_id == job_id,
+        ImportBatch.company_id == current_user.company_id
+    ).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Import not found")
+
+    counts = dict(
+        db.query(Application.status, func.count(Application.id))
+        .filter(Application.batch_id == batch.id)
+        .group_by(Application.status)
+        .all()
+    )
+    in_progress = sum(counts.get(status_name, 0) for status_name in _IN_PROGRESS_STATUSES)
+    return {
+        "batch_id": batch.id,
+        "job_id": batch.job_id,
+        "total": batch.total,
+        "processed": batch.total - in_progress,
+        "failed": counts.get("Scan Failed", 0),
+        "by_status": counts,
+        "skipped": batch.skipped or []
+    }
+
+
 # 4. VIEW APPLICANTS (With AI Scores)
 
-@router.get("/jobs/{job_id}/applicants")
+@router.get("/jobs/{job_id}/applicants", response_model=List[ApplicantResponse])
 def get_applicants(
     job_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Returns list of candidates sorted by AI Match Score (Highest first)
+    Returns list of candidates sorted by AI Match Score (Highest first),
+    then pre-screened candidates by their embedding pre-score.
     """
     # Security check
     job = db.query(Job).filter(Job.id == job_id, Job.company_id == current_user.company_id).first()
@@ -130,7 +309,157 @@ def get_applicants(
 
     applicants = db.query(Application)\
         .filter(Application.job_id == job_id)\
-        .order_by(Application.match_score.desc())\
+        .order_by(Application.match_score.desc().nulls_last(), Application.pre_score.desc().nulls_last())\
         .all()
         
-    return applicants
\ No newline at end of file
+    return applicants
+
+# 5. LLM SCORING BUDGET (Per Job)
+
+@router.put("/jobs/{job_id}/scoring")
+def update_scoring_settings(
+    job_id: int,
+    scoring: JobScoringSettings,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = db.query(Job).filter(Job.id == job_id, Job.company_id == current_user.company_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job.llm_top_k = scoring.llm_top_k
+    job.llm_min_prescore = scoring.llm_min_prescore
+    db.commit()
+    return {"message": "Scoring settings updated"}
+
+# 6. FORCE AI SCORING (for a pre-screened candidate)
+
+@router.post("/applications/{application_id}/score")
+def score_application(
+    application_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    application = db.query(Application).join(Job).filter(
+        Application.id == application_id,
+        Job.company_id == current_user.company_id
+    ).first()
+    if not application:
+        raise HTTPException(status_code=404, detail="Application not found")
+
+    application.status = "Scoring..."
+    db.commit()
+    task = llm_score_application_task.delay(application.id)
+    return {"message": "AI scoring started.", "task_id": task.id}
+
+
+# 7. APPLY TO ALL OPEN JOBS (Fan-out of an existing candidate profile)
+
+@router.post("/candidates/{profile_id}/apply-all")
+def apply_to_all_open_jobs(
+    profile_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Creates applications for every open job the candidate has not applied to yet.
+    The resume is not parsed again - all of them are pre-scored from the stored profile
+    in one batch task.
+    """
+    profile = db.query(CandidateProfile).filter(
+        CandidateProfile.id == profile_id,
+        CandidateProfile.company_id == current_user.company_id
+    ).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Candidate profile not found")
+
+    applied_job_ids = db.query(Application.job_id).join(Job).filter(
+        Job.company_id == current_user.company_id,
+        Application.candidate_email == profile.email
+    )
+    jobs = db.query(Job).filter(
+        Job.company_id == current_user.company_id,
+        Job.status == "Open",
+        Job.id.not_in(applied_job_ids)
+    ).all()
+    if not jobs:
+        return {"message": "No new open jobs for this candidate.", "application_ids": []}
+
+    applications = [
+        Application(
+            candidate_name=profile.full_name,
+            candidate_email=profile.email,
+            job_id=job.id,
+            profile_id=profile.id,
+            status="Scanning...",
+            match_score=None
+        )
+        for job in jobs
+    ]
+    db.add_all(applications)
+    db.commit()
+
+    application_ids = [application.id for application in applications]
+    task = prescore_applications_task.delay(application_ids)
+    return {
+        "message": f"Applied to {len(application_ids)} open jobs. AI analysis started.",
+        "application_ids": application_ids,
+        "task_id": task.id
+    }
+
+
+# 8. TALENT POOL (Past candidates ranked against a job)
+
+@router.get("/jobs/{job_id}/talent-pool", response_model=List[TalentMatch])
+def get_talent_pool(
+    job_id: int,
+    limit: int = Query(settings.TALENT_POOL_DEFAULT_LIMIT, ge=1, le=settings.TALENT_POOL_MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ranked shortlist of the company's previous candidates (ANN search, no AI calls)."""
+    job = db.query(Job).filter(Job.id == job_id, Job.company_id == current_user.company_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return search_talent_pool(db, job, limit)
+
+@router.post("/talent-pool/backfill")
+def backfill_talent_pool(
+    current_user: User = Depends(get_current_user)
+):
+    """Adds applicants scanned before candidate profiles existed to the talent pool."""
+    if current_user.role != "hr_admin":
+        raise HTTPException(status_code=403, detail="Only HR Admin can rebuild the talent pool")
+
+    task = backfill_candidate_profiles_task.delay(current_user.company_id)
+    return {"message": "Talent pool backfill started.", "task_id": task.id}
+
+
+# 9. AI SCORE CACHE
+
+@router.get("/score-cache/stats")
+def score_cache_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Hit rate of this company's analyze_resume cache (all processes) and its number of live entries."""
+    if current_user.role != "hr_admin":
+        raise HTTPException(status_code=403, detail="Only HR Admin can view score cache stats")
+    return get_score_cache_stats(db, current_user.company_id)
+
+@router.delete("/jobs/{job_id}/score-cache")
+def clear_job_score_cache(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Forgets cached AI scores for this job description (next scoring calls the LLM again)."""
+    if current_user.role != "hr_admin":
+        raise HTTPException(status_code=403, detail="Only HR Admin can clear the score cache")
+    job = db.query(Job).filter(Job.id == job_id, Job.company_id == current_user.company_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    deleted = invalidate_job_description(db, job.company_id, job.description)
+    return {"message": "Score cache cleared", "deleted": deleted}
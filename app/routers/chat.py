@@ -1,9 +1,15 @@
+import json
+import anyio
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Document, User, Conversation, Message
+from app.database import get_db, SessionLocal
+from app.models import DocumentChunk, User, Conversation, Message
 from app.routers.auth import get_current_user
-from app.services.ai_service import generate_embedding, get_rag_answer
+from app.services.ai_service import agenerate_embedding, aget_rag_answer, astream_rag_answer
+from app.services.answer_cache import lookup_answer, store_answer
+from app.services.vector_search import distance, nearest
 from pydantic import BaseModel
 from typing import Optional
 
@@ -17,6 +23,65 @@ class ChatResponse(BaseModel):
     response: str
     conversation_id: int
 
+# --- Blocking DB helpers (always called through run_in_threadpool) ---
+# Each one ends its transaction: an open transaction keeps a pooled connection checked out,
+# and the Groq call in between would cap concurrent chats at the pool size.
+
+def _get_or_create_conversation(db: Session, user_id: int, conversation_id: Optional[int], message: str):
+    if conversation_id:
+        conversation = db.query(Conversation).filter(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        ).first()
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    else:
+        # Create new conversation
+        conversation = Conversation(title=message[:30], user_id=user_id)
+        db.add(conversation)
+        db.flush()
+    conversation_id = conversation.id
+    db.commit()
+    return conversation_id
+
+def _search_similar_chunks(db: Session, company_id: int, query_vector, limit: int = 4):
+    # Chunks of a document that is still being (re-)indexed stay hidden until it is complete
+    query = db.query(DocumentChunk.content).filter(
+        DocumentChunk.company_id == company_id,
+        DocumentChunk.ready.is_(True)
+    ).order_by(
+        distance(DocumentChunk.embedding, query_vector)
+    )
+    similar_chunks = nearest(db, query, limit)
+    db.commit()  # also drops nearest()'s transaction-local search settings
+    return [chunk.content for chunk in similar_chunks if chunk.content]
+
+def _save_messages(db: Session, conversation_id: int, user_text: str, ai_text: str):
+    db.add(Message(content=user_text, sender="user", conversation_id=conversation_id))
+    db.add(Message(content=ai_text, sender="ai", conversation_id=conversation_id))
+    db.commit()
+
+def _save_message(db: Session, conversation_id: int, sender: str, text: str):
+    db.add(Message(content=text, sender=sender, conversation_id=conversation_id))
+    db.commit()
+
+def _save_message_new_session(conversation_id: int, sender: str, text: str):
+    # Streaming responses outlive the request-scoped session, so open our own
+    db = SessionLocal()
+    try:
+        _save_message(db, conversation_id, sender, text)
+    finally:
+        db.close()
+
+def _is_cacheable(answer: str) -> bool:
+    # Never cache provider errors - the next identical question should retry the LLM
+    return "Error generating response:" not in answer
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
 @router.post("/", response_model=ChatResponse)
 async def chat_with_docs(
     request: ChatRequest,
@@ -28,57 +93,135 @@ async def chat_with_docs(
     1. User Query -> Vector Embedding.
     2. Supabase Search -> Find matching docs (filtered by company_id).
     3. Groq -> Generate Answer based on found docs.
+
+    Nothing here blocks the event loop: DB work runs in the threadpool,
+    embedding on its own executor and Groq through the async client.
     """
     
-    # 1. Manage Conversation History
-    if request.conversation_id:
-        conversation = db.query(Conversation).filter(
-            Conversation.id == request.conversation_id,
-            Conversation.user_id == current_user.id
-        ).first()
-        if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-    else:
-        # Create new conversation
-        conversation = Conversation(title=request.message[:30], user_id=current_user.id)
-        db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+    # Plain values: the helpers' commits expire current_user, and reloading it would hit the DB on the event loop
+    user_id, company_id = current_user.id, current_user.company_id
 
-    # Save User Message
-    user_msg = Message(content=request.message, sender="user", conversation_id=conversation.id)
-    db.add(user_msg)
+    # 1. Manage Conversation History
+    conversation_id = await run_in_threadpool(
+        _get_or_create_conversation, db, user_id, request.conversation_id, request.message
+    )
     
     # 2.  VECTOR SEARCH (The Core RAG Logic)
-    query_vector = generate_embedding(request.message)
+    query_vector = await agenerate_embedding(request.message)
     
     if not query_vector:
-        return {"response": "Error generating embeddings.", "conversation_id": conversation.id}
+        return {"response": "Error generating embeddings.", "conversation_id": conversation_id}
 
-    
-    similar_docs = db.query(Document).filter(
-        Document.company_id == current_user.company_id
-    ).order_by(
-        Document.embedding.l2_distance(query_vector)
-    ).limit(4).all()
+    # Semantic cache: a near-identical question from this company was already answered
+    cached_answer, cache_generation = await run_in_threadpool(
+        lookup_answer, company_id, query_vector
+    )
 
-    # 3. Prepare Context for AI
-    context_chunks = [doc.content for doc in similar_docs if doc.content]
-    
-    if not context_chunks:
-        # If no doc related then what llm will reply
-        ai_response = "I couldn't find specific documents, but here is what I know: " + \
-                      get_rag_answer(request.message, []) 
+    if cached_answer is not None:
+        ai_response = cached_answer
     else:
-        # Real RAG Response
-        ai_response = get_rag_answer(request.message, context_chunks)
+        context_chunks = await run_in_threadpool(
+            _search_similar_chunks, db, company_id, query_vector
+        )
 
-    # 4. Save AI Response
-    ai_msg = Message(content=ai_response, sender="ai", conversation_id=conversation.id)
-    db.add(ai_msg)
-    db.commit()
+        # 3. Generate Answer
+        if not context_chunks:
+            # If no doc related then what llm will reply
+            ai_response = "I couldn't find specific documents, but here is what I know: " + \
+                          await aget_rag_answer(request.message, [])
+        else:
+            # Real RAG Response
+            ai_response = await aget_rag_answer(request.message, context_chunks)
+            if _is_cacheable(ai_response):
+                await run_in_threadpool(
+                    store_answer, company_id, cache_generation,
+                    request.message, query_vector, ai_response
+                )
+
+    # 4. Save User Message + AI Response
+    await run_in_threadpool(_save_messages, db, conversation_id, request.message, ai_response)
 
     return {
         "response": ai_response, 
-        "conversation_id": conversation.id
-    }
\ No newline at end of file
+        "conversation_id": conversation_id
+    }
+
+
+@router.post("/stream")
+async def chat_with_docs_stream(
+    request: ChatRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Same RAG flow as POST /api/chat/, but the answer is sent as Server-Sent Events:
+    - event "meta":  {"conversation_id": ...} (sent first)
+    - data frames:   {"token": "..."} as Groq generates them
+    - event "done":  {"conversation_id": ...} once the answer is saved
+    The question is saved before streaming starts; the answer (partial if the client
+    disconnects mid-stream) is saved when the stream ends.
+    """
+    user_id, company_id = current_user.id, current_user.company_id
+    conversation_id = await run_in_threadpool(
+        _get_or_create_conversation, db, user_id, request.conversation_id, request.message
+    )
+    await run_in_threadpool(_save_message, db, conversation_id, "user", request.message)
+
+    query_vector = await agenerate_embedding(request.message)
+    cached_answer, cache_generation, context_chunks = None, 0, []
+    if query_vector:
+        cached_answer, cache_generation = await run_in_threadpool(
+            lookup_answer, company_id, query_vector
+        )
+        if cached_answer is None:
+            context_chunks = await run_in_threadpool(
+                _search_similar_chunks, db, company_id, query_vector
+            )
+
+    async def event_stream():
+        parts = []
+        completed = False
+        try:
+            yield _sse({"conversation_id": conversation_id}, event="meta")
+
+            if not query_vector:
+                parts.append("Error generating embeddings.")
+                yield _sse({"token": parts[0]})
+            elif cached_answer is not None:
+                # Cache hit: the whole answer goes out as a single frame
+                parts.append(cached_answer)
+                yield _sse({"token": cached_answer})
+            else:
+                if not context_chunks:
+                    prefix = "I couldn't find specific documents, but here is what I know: "
+                    parts.append(prefix)
+                    yield _sse({"token": prefix})
+
+                async for token in astream_rag_answer(request.message, context_chunks):
+                    parts.append(token)
+                    yield _sse({"token": token})
+
+                answer = "".join(parts)
+                if context_chunks and _is_cacheable(answer):
+                    await run_in_threadpool(
+                        store_answer, company_id, cache_generation,
+                        request.message, query_vector, answer
+                    )
+            completed = True
+        finally:
+            # Runs on client disconnect too: whatever was generated so far is kept.
+            # Shielded, because the disconnect cancels this task.
+            if parts:
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(
+                        _save_message_new_session, conversation_id, "ai", "".join(parts)
+                    )
+
+        if completed:
+            yield _sse({"conversation_id": conversation_id}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -3,13 +3,28 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Company, User
 from app.routers.auth import get_current_user
+from app.services.leave_rules import merge_rules
 from pydantic import BaseModel
+from typing import List, Optional
 
 router = APIRouter()
 
 class CompanySettings(BaseModel):
     yearly_leaves: int
 
+class AutoApproveRule(BaseModel):
+    keywords: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None  # Phrases that send a request to triage ("cold feet")
+    max_days: Optional[int] = None
+
+class ReviewRule(BaseModel):
+    keywords: Optional[List[str]] = None
+    min_days: Optional[int] = None
+
+class LeaveRules(BaseModel):
+    auto_approve: Optional[AutoApproveRule] = None
+    review: Optional[ReviewRule] = None
+
 # 1. Update Company Settings (Only Admin)
 @router.put("/settings")
 def update_settings(
@@ -33,4 +48,28 @@ def get_settings(
     current_user: User = Depends(get_current_user)
 ):
     company = db.query(Company).filter(Company.id == current_user.company_id).first()
-    return {"yearly_leaves": company.yearly_leaves}
\ No newline at end of file
+    return {"yearly_leaves": company.yearly_leaves}
+
+# 3. Leave Rules (decide clear leave requests without AI)
+@router.get("/leave-rules")
+def get_leave_rules(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Effective rules: company overrides merged over the defaults."""
+    company = db.query(Company).filter(Company.id == current_user.company_id).first()
+    return merge_rules(company.leave_rules)
+
+@router.put("/leave-rules")
+def update_leave_rules(
+    rules: LeaveRules,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "hr_admin":
+        raise HTTPException(status_code=403, detail="Only Admin can change settings")
+
+    company = db.query(Company).filter(Company.id == current_user.company_id).first()
+    company.leave_rules = rules.model_dump(exclude_none=True)
+    db.commit()
+    return {"message": "Leave rules updated", "rules": merge_rules(company.leave_rules)}
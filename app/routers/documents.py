@@ -1,12 +1,14 @@
-import os
-import shutil
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Document, User
 from app.routers.auth import get_current_user
 from app.celery_worker import process_document_task
+from app.services.answer_cache import invalidate_company_answers
+from app.services.storage import BlobTooLarge, delete_blobs, save_upload
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -16,6 +18,11 @@ class DocumentResponse(BaseModel):
     id: int
     filename: str
     company_id: int
+    status: Optional[str] = None
+    chunk_count: Optional[int] = None
+    chunks_total: Optional[int] = None
+    chunks_done: Optional[int] = None
+    error: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -30,47 +37,86 @@ async def upload_document(
 ):
     """
     1. HR uploads PDF/DOCX policies.
-    2. Files saved temporarily.
+    2. Files streamed to the blob store (workers get the key, not a local path).
     3. DB entry created.
     4. Celery triggers 'process_document_task' (Chunking + Embedding).
+    Files that can't be queued (too large, previous version still processing, duplicate)
+    come back with "error" / "skipped" instead of failing the whole request.
     """
     # Security Check
     if not current_user.company_id:
         raise HTTPException(status_code=400, detail="User is not linked to any company")
 
-    # Temp directory for processing
-    upload_dir = "temp_documents"
-    os.makedirs(upload_dir, exist_ok=True)
-    
     uploaded_tasks = []
 
     for file in files:
-        # 1. Save file to disk
-        # Filename ko unique banane ki zaroorat nahi kyunki DB ID unique hai,
-        # lekin collision avoid karne ke liye prefix lagate hain.
-        safe_filename = f"{current_user.company_id}_{file.filename}"
-        file_path = os.path.join(upload_dir, safe_filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 1. Stream file to the blob store (sha256 computed while copying, off the event loop)
+        try:
+            blob_key, file_hash = await run_in_threadpool(
+                save_upload, file.file, f"documents/{current_user.company_id}", file.filename
+            )
+        except BlobTooLarge as e:
+            # Per-file result: earlier files of this request are already queued, their ids must reach the client
+            uploaded_tasks.append({
+                "filename": file.filename,
+                "doc_id": None,
+                "task_id": None,
+                "error": str(e)
+            })
+            continue
+
+        # 2. Skip files this company has already indexed (same content)
+        duplicate = db.query(Document).filter(
+            Document.company_id == current_user.company_id,
+            Document.file_hash == file_hash,
+            Document.status != "Failed"
+        ).first()
+        if duplicate:
+            await run_in_threadpool(delete_blobs, [blob_key])
+            uploaded_tasks.append({
+                "filename": file.filename,
+                "doc_id": duplicate.id,
+                "task_id": None,
+                "skipped": "Already indexed"
+            })
+            continue
 
-        # 2. Create DB Entry (Initial Status placeholder)
-        new_doc = Document(
-            filename=file.filename,
-            content="Processing...", # Celery will update this with real text
-            company_id=current_user.company_id
-            
-        )
-        db.add(new_doc)
+        # 3. Re-upload of an existing file -> re-index the same document (only changed chunks)
+        doc = db.query(Document).filter(
+            Document.company_id == current_user.company_id,
+            Document.filename == file.filename
+        ).first()
+        if doc:
+            # Atomic claim: two pipelines on the same document would interleave their chunk writes,
+            # so a new version is only accepted once the previous one is Ready / Failed
+            claimed = db.execute(
+                update(Document)
+                .where(Document.id == doc.id, Document.status.in_(["Ready", "Failed"]))
+                .values(status="Processing", file_hash=file_hash, error=None)
+            ).rowcount
+            if not claimed:
+                uploaded_tasks.append({
+                    "filename": file.filename,
+                    "doc_id": doc.id,
+                    "task_id": None,
+                    "skipped": "Previous version is still being processed, try again once it is Ready"
+                })
+                db.rollback()
+                await run_in_threadpool(delete_blobs, [blob_key])
+                continue
+        else:
+            doc = Document(filename=file.filename, company_id=current_user.company_id, file_hash=file_hash,
+                           status="Processing")  # Celery will set "Ready" once chunks are indexed
+            db.add(doc)
         db.commit()
-        db.refresh(new_doc)
+        db.refresh(doc)
 
-        # 3.  Trigger Celery Task
-        task = process_document_task.delay(new_doc.id, file_path)
+        # 4.  Trigger Celery Task
+        task = process_document_task.delay(doc.id, blob_key)
         
         uploaded_tasks.append({
             "filename": file.filename,
-            "doc_id": new_doc.id,
+            "doc_id": doc.id,
             "task_id": task.id
         })
 
@@ -87,6 +133,27 @@ def get_documents(
 ):
     """
     Returns list of documents uploaded by THIS user's company only.
+    One row per file - chunks live in document_chunks and are never loaded here.
     """
     docs = db.query(Document).filter(Document.company_id == current_user.company_id).all()
-    return docs
\ No newline at end of file
+    return docs
+
+# 3. DELETE DOCUMENT (Chunks are removed by ON DELETE CASCADE)
+@router.delete("/{doc_id}")
+def delete_document(
+    doc_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "hr_admin":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    doc = db.query(Document).filter(Document.id == doc_id, Document.company_id == current_user.company_id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    db.delete(doc)
+    db.commit()
+
+    invalidate_company_answers(current_user.company_id)
+    return {"message": "Document removed"}
\ No newline at end of file
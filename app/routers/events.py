@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import anyio
+import redis.asyncio as aioredis
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from jose import JWTError, jwt
+
+from app.config import settings
+from app.models import User
+from app.routers.auth import get_current_user
+from app.services.events import company_channel
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+STREAM_TOKEN_SCOPE = "events"
+STREAM_TOKEN_SECONDS = 60
+
+
+@router.post("/token")
+def create_stream_token(current_user: User = Depends(get_current_user)):
+    """
+    EventSource can't send headers, so the stream is opened with ?token=. That token is a
+    separate one: valid for STREAM_TOKEN_SECONDS, only for /stream, useless as an API credential,
+    so whatever ends up in access / proxy logs expires within a minute.
+    """
+    if not current_user.company_id:
+        raise HTTPException(status_code=400, detail="User is not linked to any company")
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_SECONDS)
+    stream_token = jwt.encode(
+        {"sub": current_user.email, "company_id": current_user.company_id, "scope": STREAM_TOKEN_SCOPE, "exp": expire},
+        settings.SECRET_KEY, algorithm=settings.ALGORITHM
+    )
+    return {"stream_token": stream_token, "expires_in": STREAM_TOKEN_SECONDS}
+
+
+def _company_from_stream_token(token: str) -> int:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("scope") != STREAM_TOKEN_SCOPE or not payload.get("company_id"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload["company_id"]
+
+
+@router.get("/stream")
+async def stream_events(request: Request, token: str = Query(...)):
+    """
+    Server-Sent Events with live status changes of this company's applications and documents
+    (published by the Celery tasks). token: a stream token from POST /api/events/token
+    (checked once, when the stream is opened; no DB access).
+    """
+    company_id = _company_from_stream_token(token)
+
+    async def event_stream():
+        client = aioredis.Redis.from_url(settings.REDIS_URL)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(company_channel(company_id))
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_SECONDS)
+                if message is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": ping\n\n"
+                    continue
+                yield f"data: {message['data'].decode()}\n\n"
+        finally:
+            # A client disconnect cancels this task (the cancellation propagates); shielded,
+            # otherwise it would also cancel the cleanup and leak the Redis connection
+            with anyio.CancelScope(shield=True):
+                await pubsub.unsubscribe()
+                await pubsub.aclose()
+                await client.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import and_, desc
 from app.database import get_db
-from app.models import User, LeaveRequest, Company
+from app.models import User, LeaveRequest, LeaveBalance, Company
 from app.routers.auth import get_current_user
-from app.services.ai_service import analyze_leave
+from app.services.leave_rules import evaluate_leave
+from app.services.leave_balance import record_status_change
+from app.celery_worker import triage_leave_task, rebuild_leave_balances_task
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -23,12 +26,13 @@ class LeaveAction(BaseModel):
 # 1. EMPLOYEE SIDE (Apply)
 @router.post("/apply")
 def apply_leave(leave: LeaveCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # 1. AI Analysis
-    ai_result = analyze_leave(leave.reason, leave.days)
+    # 1. Company rule engine (local, instant) decides the clear cases
+    company = db.query(Company).filter(Company.id == current_user.company_id).first()
+    decision = evaluate_leave(company.leave_rules if company else None, leave.reason, leave.days)
     
     # 2. Auto-Approval Logic
     final_status = "Pending"
-    if ai_result.get("recommendation") == "Auto-Approve":
+    if decision and decision["recommendation"] == "Auto-Approve":
         final_status = "Approved" 
 
     new_leave = LeaveRequest(
@@ -38,31 +42,45 @@ def apply_leave(leave: LeaveCreate, db: Session = Depends(get_db), current_user:
         end_date=leave.end_date,
         days_count=leave.days,
         status=final_status,
-        ai_recommendation=ai_result.get("recommendation", "Human-Review"),
-        ai_reason=ai_result.get("reason", "Needs manual check")
+        ai_recommendation=decision["recommendation"] if decision else "Triage",
+        ai_reason=decision["reason"] if decision else "Queued for AI review"
     )
     db.add(new_leave)
+    # Auto-approved -> balance ledger updated in the same transaction
+    record_status_change(db, current_user.id, leave.days, leave.start_date, None, final_status)
     db.commit()
-    return {"message": "Leave Applied", "status": final_status}
 
-@router.get("/my-stats")
-def get_leave_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    company = db.query(Company).filter(Company.id == current_user.company_id).first()
-    total_allocated = company.yearly_leaves if company and company.yearly_leaves else 20
+    # 3. Ambiguous -> AI triage in the background (response doesn't wait for Groq)
+    if not decision:
+        triage_leave_task.delay(new_leave.id)
 
-    used_leaves = db.query(func.sum(LeaveRequest.days_count))\
-        .filter(LeaveRequest.user_id == current_user.id, LeaveRequest.status == "Approved")\
-        .scalar() or 0  
+    return {"message": "Leave Applied", "status": final_status}
 
-    approved_requests_count = db.query(LeaveRequest)\
-        .filter(LeaveRequest.user_id == current_user.id, LeaveRequest.status == "Approved")\
-        .count()
+@router.get("/my-stats")
+def get_leave_stats(
+    year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """One query: company (PK) + this user's balance row for the year (PK)."""
+    year = year or datetime.now().year
+    row = db.query(Company.name, Company.yearly_leaves, LeaveBalance.days_used, LeaveBalance.approved_count)\
+        .select_from(User)\
+        .outerjoin(Company, Company.id == User.company_id)\
+        .outerjoin(LeaveBalance, and_(LeaveBalance.user_id == User.id, LeaveBalance.year == year))\
+        .filter(User.id == current_user.id)\
+        .first()
+
+    company_name, yearly_leaves, used_leaves, approved_requests_count = row
+    total_allocated = yearly_leaves or 20
+    used_leaves = used_leaves or 0
     
     return {
+        "year": year,
         "total_allocated": total_allocated,
         "balance": total_allocated - used_leaves,
-        "accepted_count": approved_requests_count,
-        "company_name": company.name if company else "Unknown"
+        "accepted_count": approved_requests_count or 0,
+        "company_name": company_name or "Unknown"
     }
 
 # 2. ADMIN SIDE (Review)
@@ -115,11 +133,23 @@ def update_leave_status(
     if current_user.role != "hr_admin":
         raise HTTPException(status_code=403, detail="Unauthorized")
 
-    leave = db.query(LeaveRequest).filter(LeaveRequest.id == leave_id).first()
+    # Row lock: the triage task may be changing the same leave concurrently
+    leave = db.query(LeaveRequest).filter(LeaveRequest.id == leave_id).with_for_update().first()
     if not leave:
         raise HTTPException(status_code=404, detail="Leave request not found")
 
+    old_status = leave.status
     leave.status = action.status
+    record_status_change(db, leave.user_id, leave.days_count, leave.start_date, old_status, action.status, leave.created_at)
     db.commit()
     
-    return {"message": f"Leave {action.status}"}
\ No newline at end of file
+    return {"message": f"Leave {action.status}"}
+
+# Rebuild the balance ledger from the leave requests (consistency job)
+@router.post("/balances/rebuild")
+def rebuild_leave_balances(current_user: User = Depends(get_current_user)):
+    if current_user.role != "hr_admin":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    task = rebuild_leave_balances_task.delay(current_user.company_id)
+    return {"message": "Leave balance rebuild started.", "task_id": task.id}
\ No newline at end of file
@@ -1,9 +1,9 @@
-import os
-import shutil
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List
 from app.celery_worker import schedule_meeting_task, send_email_task
+from app.services.storage import BlobTooLarge, delete_blobs, save_upload
 
 router = APIRouter()
 
@@ -33,21 +33,21 @@ async def send_email(
 ):
     # Convert comma-separated string to list
     recipient_list = [email.strip() for email in recipients.split(",")]
-    file_paths = []
+    attachment_keys = []
 
-    # 1. Save uploaded files temporarily (Celery needs paths)
+    # 1. Stream attachments to the blob store (Celery worker fetches them by key)
     if files:
-        temp_dir = "temp_uploads"
-        os.makedirs(temp_dir, exist_ok=True)
         for file in files:
             # Check if filename exists to avoid error
             if file.filename:
-                file_path = os.path.join(temp_dir, file.filename)
-                with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                file_paths.append(file_path)
+                try:
+                    key, _ = await run_in_threadpool(save_upload, file.file, "attachments", file.filename)
+                except BlobTooLarge as e:
+                    await run_in_threadpool(delete_blobs, attachment_keys)
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"{file.filename}: {e}")
+                attachment_keys.append(key)
 
     # 2. Push task to Celery
-    task = send_email_task.delay(recipient_list, subject, body, file_paths)
+    task = send_email_task.delay(recipient_list, subject, body, attachment_keys)
     
     return {"message": "Email sending started...", "task_id": task.id}
\ No newline at end of file
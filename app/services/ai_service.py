@@ -1,29 +1,131 @@
 import os
-from groq import Groq
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from groq import Groq, AsyncGroq
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.rate_limiter import call_with_rate_limit, acall_with_rate_limit, INTERACTIVE, BATCH
 import json
 
-# 1. Initialize Embedding Model (Free & High Performance)
+# Heavy clients are created lazily (first use or warm_up_models()), NOT at import time.
+# Importing this module must stay cheap: email-only workers never load torch.
+_embedding_model = None
+_groq_client = None
+_async_groq_client = None
+_init_lock = threading.Lock()
 
-embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# CPU-bound embedding from async code runs here (bounded, so inference can't starve FastAPI's own threadpool)
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=settings.EMBEDDING_EXECUTOR_WORKERS, thread_name_prefix="embedding"
+)
 
-# 2. Initialize Groq Client
-client = Groq(api_key=settings.GROQ_API_KEY)
+# Vectors are cached per (model, normalized text) so repeated questions & boilerplate chunks skip inference
+embedding_cache = EmbeddingCache(
+    model_name=settings.EMBEDDING_MODEL_NAME,
+    max_items=settings.EMBEDDING_CACHE_SIZE,
+    redis_url=settings.REDIS_URL if settings.EMBEDDING_CACHE_USE_REDIS else None,
+    ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    lowercase=settings.EMBEDDING_MODEL_UNCASED,
+)
+
+# 1. Embedding Model (Free & High Performance)
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        with _init_lock:
+            if _embedding_model is None:
+                # Imported here because it pulls in torch + sentence-transformers
+                from langchain_community.embeddings import HuggingFaceEmbeddings
+                threads = settings.TORCH_NUM_THREADS or int(os.environ.get("OMP_NUM_THREADS", 0))
+                if threads:
+                    import torch
+                    torch.set_num_threads(threads)
+                print(f"🧠 Loading embedding model: {settings.EMBEDDING_MODEL_NAME}")
+                _embedding_model = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+# 2. Groq Client
+def get_groq_client():
+    global _groq_client
+    if _groq_client is None:
+        with _init_lock:
+            if _groq_client is None:
+                # Retries are done by the shared rate limiter (services/rate_limiter.py), not the SDK
+                _groq_client = Groq(api_key=settings.GROQ_API_KEY, max_retries=0)
+    return _groq_client
+
+def get_async_groq_client():
+    global _async_groq_client
+    if _async_groq_client is None:
+        with _init_lock:
+            if _async_groq_client is None:
+                _async_groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY, max_retries=0)
+    return _async_groq_client
+
+def is_embedding_model_loaded() -> bool:
+    return _embedding_model is not None
+
+def warm_up_models():
+    """
+    Loads the embedding model (and runs one tiny inference) + creates the Groq client.
+    Called on FastAPI startup and Celery worker_process_init when EMBEDDING_WARMUP is on.
+    """
+    get_groq_client()
+    get_embedding_model().embed_query("warm up")
+    print("✅ AI models warmed up")
 
 def generate_embedding(text: str):
     """Generates vector embedding for a given text string."""
     try:
+        cached = embedding_cache.get_many([text])[0]
+        if cached is not None:
+            return cached
+
         # Returns a list of floats (e.g., [0.1, -0.5, ...])
-        return embedding_model.embed_query(text)
+        vector = get_embedding_model().embed_query(text)
+        embedding_cache.put_many([text], [vector])
+        return vector
     except Exception as e:
         print(f"❌ Error generating embedding: {e}")
         return None
 
-def get_rag_answer(query: str, context_chunks: list[str]):
+def generate_embeddings(texts: list[str], batch_size: int | None = None):
     """
-    Sends the User Query + Retrieved Context to Groq Llama-3.
+    Generates vector embeddings for many texts, batch_size texts per forward pass.
+    Much faster than calling generate_embedding() in a loop for document chunks.
     """
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    try:
+        vectors = embedding_cache.get_many(texts)
+
+        # Only embed texts that missed the cache (deduplicated by cache key)
+        pending = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                pending.setdefault(embedding_cache.make_key(texts[i]), []).append(i)
+
+        unique_texts = [texts[positions[0]] for positions in pending.values()]
+        computed = []
+        model = get_embedding_model() if unique_texts else None
+        for start in range(0, len(unique_texts), batch_size):
+            computed.extend(model.embed_documents(unique_texts[start:start + batch_size]))
+
+        if unique_texts:
+            embedding_cache.put_many(unique_texts, computed)
+        for positions, vector in zip(pending.values(), computed):
+            for i in positions:
+                vectors[i] = vector
+        return vectors
+    except Exception as e:
+        print(f"❌ Error generating batch embeddings: {e}")
+        return None
+
+def get_embedding_cache_stats():
+    """Hit/miss counters of the embedding cache (for this process)."""
+    return embedding_cache.get_stats()
+
+def _build_rag_messages(query: str, context_chunks: list[str]):
     context_text = "\n\n".join(context_chunks)
     
     system_prompt = """You are a helpful HR Assistant for this company. 
@@ -37,24 +139,84 @@ def get_rag_answer(query: str, context_chunks: list[str]):
 
     Question: {query}
     """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
 
+def get_rag_answer(query: str, context_chunks: list[str]):
+    """
+    Sends the User Query + Retrieved Context to Groq Llama-3.
+    """
+    messages = _build_rag_messages(query, context_chunks)
     try:
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        response = call_with_rate_limit(lambda: get_groq_client().chat.completions.create(
+            messages=messages,
             model="llama-3.3-70b-versatile", 
             temperature=0.1, # Low temperature for factual accuracy
-        )
+        ), messages, priority=INTERACTIVE)
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"Error generating response: {str(e)}"
+
+# --- Async variants (used by the /api/chat request path, never block the event loop) ---
+
+async def agenerate_embedding(text: str):
+    """Runs generate_embedding() on the dedicated embedding thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_embedding_executor, generate_embedding, text)
+
+async def aget_rag_answer(query: str, context_chunks: list[str]):
+    """Async version of get_rag_answer() using the AsyncGroq client."""
+    messages = _build_rag_messages(query, context_chunks)
+    try:
+        response = await acall_with_rate_limit(lambda: get_async_groq_client().chat.completions.create(
+            messages=messages,
+            model="llama-3.3-70b-versatile",
+            temperature=0.1,
+        ), messages, priority=INTERACTIVE)
         return response.choices[0].message.content
     except Exception as e:
         return f"Error generating response: {str(e)}"
 
-def analyze_resume(resume_text: str, job_description: str):
+async def astream_rag_answer(query: str, context_chunks: list[str]):
+    """
+    Streaming version of aget_rag_answer(): yields answer tokens as Groq produces them.
+    """
+    messages = _build_rag_messages(query, context_chunks)
+    try:
+        stream = await acall_with_rate_limit(lambda: get_async_groq_client().chat.completions.create(
+            messages=messages,
+            model="llama-3.3-70b-versatile",
+            temperature=0.1,
+            stream=True,
+        ), messages, priority=INTERACTIVE)
+        async for chunk in stream:
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                yield token
+    except Exception as e:
+        yield f"Error generating response: {str(e)}"
+
+# Bump when the analyze_resume prompt / output format changes: old cached scores stop matching
+RESUME_SCORING_MODEL = "llama-3.3-70b-versatile"
+RESUME_PROMPT_VERSION = "3"
+
+def analyze_resume(resume_text: str, job_description: str, skill_hints: dict | None = None):
     """
     ATS Logic: Compares Resume vs JD and returns JSON score.
+    resume_text can be the full resume or the structured candidate profile.
+    skill_hints: {"matched": [...], "missing": [...]} from the local skill matcher.
+    """
+    hints = ""
+    if skill_hints:
+        hints = f"""
+    Skill check already done (keyword match, may miss equivalents):
+    Matched: {", ".join(skill_hints.get("matched") or []) or "-"}
+    Missing: {", ".join(skill_hints.get("missing") or []) or "-"}
+    Only list missing skills that are not in this check.
     """
+
     prompt = f"""
     You are an expert ATS (Applicant Tracking System).
     
@@ -63,7 +225,7 @@ def analyze_resume(resume_text: str, job_description: str):
     
     Candidate Resume:
     {resume_text}
-    
+    {hints}
     Task:
     1. Evaluate the candidate's match score (0-100).
     2. List missing skills.
@@ -77,19 +239,56 @@ def analyze_resume(resume_text: str, job_description: str):
     }}
     """
     
+    messages = [{"role": "user", "content": prompt}]
     try:
-        response = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
+        # Batch priority: bulk scans must leave headroom for interactive chat
+        response = call_with_rate_limit(lambda: get_groq_client().chat.completions.create(
+            messages=messages,
+            model=RESUME_SCORING_MODEL,
             temperature=0.0,
             response_format={"type": "json_object"} # Ensures valid JSON
-        )
+        ), messages, priority=BATCH, max_output_tokens=300)
         return json.loads(response.choices[0].message.content)
     except Exception as e:
         print(f"ATS Error: {e}")
         return {"score": 0, "error": str(e)}
     
 
+def summarize_resume(resume_text: str):
+    """
+    Turns a full resume into a compact structured profile (done once per resume file).
+    Scoring against further jobs sends this instead of the whole resume text.
+    """
+    prompt = f"""
+    You are an expert technical recruiter. Summarize this resume as a structured profile.
+
+    Resume:
+    {resume_text}
+
+    Output format must be strictly JSON:
+    {{
+        "headline": "Backend Engineer, 5 years",
+        "years_experience": 5,
+        "skills": ["Python", "FastAPI", "PostgreSQL"],
+        "roles": ["Backend Engineer at Acme (2021-2024)"],
+        "education": "B.Tech Computer Science",
+        "highlights": ["Led migration to microservices"]
+    }}
+    """
+
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        response = call_with_rate_limit(lambda: get_groq_client().chat.completions.create(
+            messages=messages,
+            model="llama-3.3-70b-versatile",
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        ), messages, priority=BATCH, max_output_tokens=500)
+        return json.loads(response.choices[0].message.content)
+    except Exception as e:
+        print(f"Resume Summary Error: {e}")
+        return None
+
 def analyze_leave(reason: str, days: int):
     """
     Decides if leave should be Auto-Approved or Needs Review.
@@ -105,16 +304,17 @@ def analyze_leave(reason: str, days: int):
     
     user_prompt = f"Reason: {reason}, Duration: {days} days."
 
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
     try:
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        response = call_with_rate_limit(lambda: get_groq_client().chat.completions.create(
+            messages=messages,
             model="llama-3.3-70b-versatile",
             temperature=0.0,
             response_format={"type": "json_object"}
-        )
+        ), messages, priority=INTERACTIVE, max_output_tokens=100)
         return json.loads(response.choices[0].message.content)
     except Exception as e:
         return {"recommendation": "Human-Review", "reason": "AI Error"}
\ No newline at end of file
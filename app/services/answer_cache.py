@@ -0,0 +1,97 @@
+import base64
+import json
+
+import numpy as np
+import redis
+
+from app.config import settings
+
+# Per-company semantic cache of RAG answers (Redis).
+# Layout:
+#   answer_cache:{company_id}:gen          -> generation counter (bumped when the company's documents change)
+#   answer_cache:{company_id}:{gen}:items  -> list of JSON entries {"q", "v", "a"} (newest first)
+# Bumping the generation invalidates every cached answer at once; old lists simply expire.
+
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5)
+    return _redis
+
+
+def _gen_key(company_id: int) -> str:
+    return f"answer_cache:{company_id}:gen"
+
+
+def _items_key(company_id: int, generation: int) -> str:
+    return f"answer_cache:{company_id}:{generation}:items"
+
+
+def _encode_vector(vector) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+
+
+def _decode_vector(encoded: str):
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+
+
+def lookup_answer(company_id: int, query_vector):
+    """
+    Returns (answer or None, generation).
+    answer is the cached answer of the most similar previous question if its cosine
+    similarity >= ANSWER_CACHE_SIMILARITY. Pass generation back to store_answer().
+    """
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None, 0
+
+    try:
+        client = _get_redis()
+        generation = int(client.get(_gen_key(company_id)) or 0)
+        raw_entries = client.lrange(_items_key(company_id, generation), 0, -1)
+    except Exception as e:
+        print(f"⚠️ Answer cache read failed: {e}")
+        return None, 0
+
+    if not raw_entries:
+        return None, generation
+
+    entries = [json.loads(raw) for raw in raw_entries]
+    matrix = np.stack([_decode_vector(entry["v"]) for entry in entries])
+    query = np.asarray(query_vector, dtype=np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    similarities = matrix @ query / np.where(norms == 0, 1.0, norms)
+    best = int(np.argmax(similarities))
+
+    if similarities[best] >= settings.ANSWER_CACHE_SIMILARITY:
+        return entries[best]["a"], generation
+    return None, generation
+
+
+def store_answer(company_id: int, generation: int, question: str, query_vector, answer: str):
+    """Caches an answer under the generation that was current when the question was looked up."""
+    if not settings.ANSWER_CACHE_ENABLED:
+        return
+
+    try:
+        client = _get_redis()
+        key = _items_key(company_id, generation)
+        entry = json.dumps({"q": question, "v": _encode_vector(query_vector), "a": answer})
+        pipe = client.pipeline()
+        pipe.lpush(key, entry)
+        pipe.ltrim(key, 0, settings.ANSWER_CACHE_MAX_ENTRIES - 1)
+        pipe.expire(key, settings.ANSWER_CACHE_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        print(f"⚠️ Answer cache write failed: {e}")
+
+
+def invalidate_company_answers(company_id: int):
+    """Drops all cached answers of a company (called whenever its documents change)."""
+    try:
+        _get_redis().incr(_gen_key(company_id))
+    except Exception as e:
+        print(f"⚠️ Answer cache invalidation failed: {e}")
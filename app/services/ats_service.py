@@ -0,0 +1,313 @@
+import hashlib
+import json
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Application, CandidateProfile, Job
+from app.services.ai_service import generate_embeddings, summarize_resume
+from app.services.document_service import create_chunks, extract_text_from_blob
+from app.services.skill_service import compare_skills, extract_skills
+from app.services.vector_search import distance, distance_to_similarity, nearest
+
+
+def embed_long_text(text: str):
+    """
+    One vector for a whole JD / resume: the text is chunked to the model window,
+    every chunk embedded, and the mean re-normalized (MiniLM alone would truncate
+    everything after ~256 tokens).
+    """
+    chunks = create_chunks(text or "")
+    if not chunks:
+        return None
+    vectors = generate_embeddings(chunks)
+    if not vectors:
+        return None
+    mean = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
+
+
+def similarity_score(a, b) -> float:
+    """Cosine similarity as a 0-100 pre-score."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denominator = np.linalg.norm(a) * np.linalg.norm(b)
+    if not denominator:
+        return 0.0
+    return round(max(0.0, float(a @ b / denominator)) * 100, 2)
+
+
+def ensure_job_embedding(db: Session, job: Job):
+    """Jobs created before pre-ranking existed get their embedding on first use."""
+    if job.embedding is None:
+        job.embedding = embed_long_text(job.description)
+        db.commit()
+    return job.embedding
+
+
+def apply_skill_gap(db: Session, application: Application, job: Job, profile: CandidateProfile):
+    """Matched / missing skills from the dictionary matcher (no network call)."""
+    if job.required_skills is None:
+        job.required_skills = extract_skills(job.description)
+    if profile.skills is None:
+        profile.skills = extract_skills(profile.resume_text)
+    application.matched_skills, application.missing_skills = compare_skills(job.required_skills, profile.skills)
+    db.commit()
+
+
+def _llm_budget(job: Job):
+    """Per-job settings override ATS_LLM_MIN_PRESCORE / ATS_LLM_TOP_K."""
+    threshold = job.llm_min_prescore if job.llm_min_prescore is not None else settings.ATS_LLM_MIN_PRESCORE
+    top_k = job.llm_top_k if job.llm_top_k is not None else settings.ATS_LLM_TOP_K
+    return threshold, top_k
+
+
+def above_llm_threshold(application: Application, job: Job) -> bool:
+    """Candidates at or above the job's pre-score threshold go to the LLM right away."""
+    threshold, _ = _llm_budget(job)
+    return threshold is not None and application.pre_score >= threshold
+
+
+def select_top_k_for_llm(db: Session, job: Job) -> list:
+    """
+    Top-K selection, re-ranked over ALL applicants of the job once none of them is still
+    being scanned: the "Pre-Screened" ones inside the top-K by pre-score move to "Scoring..."
+    and are returned (the caller queues their LLM calls).
+
+    Deciding per applicant on arrival would send everyone who is top-K *so far* (ascending
+    arrival order or a concurrent bulk scan -> up to all N). This way a bulk import or a burst
+    of scans costs exactly K calls; afterwards a new applicant costs one call only if it ranks
+    inside the top-K of everybody so far (late candidates can always be forced via
+    POST /applications/{id}/score). The job row lock keeps scans that finish together from
+    selecting the same applicants twice.
+    """
+    _, top_k = _llm_budget(job)
+    if not top_k:
+        return []
+
+    db.query(Job.id).filter(Job.id == job.id).with_for_update().one()
+    still_scanning = db.query(Application.id).filter(
+        Application.job_id == job.id, Application.status == "Scanning..."
+    ).first()
+    if still_scanning:
+        db.rollback()  # The last scan of the burst does the ranking
+        return []
+
+    top = db.query(Application).filter(
+        Application.job_id == job.id, Application.pre_score.isnot(None)
+    ).order_by(Application.pre_score.desc(), Application.id).limit(top_k).all()
+    selected = [application for application in top if application.status == "Pre-Screened"]
+    for application in selected:
+        application.status = "Scoring..."
+        application.ai_feedback = None
+    db.commit()
+    return selected
+
+
+# --- Candidate Profiles (parse once, score against many jobs) ---
+
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+
+def find_email(text: str):
+    """First email address in a resume (bulk imports without a manifest row)."""
+    match = _EMAIL_RE.search(text or "")
+    return match.group(0).lower() if match else None
+
+
+def get_or_create_profile(db: Session, company_id: int, email: str, full_name: str, file_hash: str, blob_key: str,
+                          resume_text: str = None):
+    """
+    Returns the profile for (company, email, resume file hash).
+    The PDF is only parsed & embedded when this exact file was never seen before
+    (resume_text: already extracted by the caller).
+    """
+    profile = db.query(CandidateProfile).filter(
+        CandidateProfile.company_id == company_id,
+        CandidateProfile.email == email,
+        CandidateProfile.file_hash == file_hash
+    ).first()
+    if profile:
+        print(f"♻️ Reusing candidate profile {profile.id} for {email}")
+        return profile
+
+    if resume_text is None:
+        resume_text = extract_text_from_blob(blob_key)
+    profile = CandidateProfile(
+        company_id=company_id,
+        email=email,
+        full_name=full_name,
+        file_hash=file_hash,
+        resume_text=resume_text,
+        skills=extract_skills(resume_text),
+        embedding=embed_long_text(resume_text)
+    )
+    db.add(profile)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Same file processed concurrently by another application: use that profile
+        db.rollback()
+        profile = db.query(CandidateProfile).filter(
+            CandidateProfile.company_id == company_id,
+            CandidateProfile.email == email,
+            CandidateProfile.file_hash == file_hash
+        ).first()
+    return profile
+
+
+def ensure_profile_summary(db: Session, profile: CandidateProfile):
+    """
+    Generates the structured LLM summary once. Returns None while another worker is
+    summarizing it, or when the last attempt failed and its backoff hasn't passed.
+
+    The work is claimed with a short UPDATE + commit, and the (possibly rate-limited,
+    minutes long) Groq call runs with no transaction / row lock held.
+    """
+    if profile.summary:
+        return profile.summary
+
+    profile_id, resume_text = profile.id, profile.resume_text or ""
+    now = datetime.now(timezone.utc)
+    claimed = db.execute(
+        update(CandidateProfile)
+        .where(
+            CandidateProfile.id == profile_id,
+            CandidateProfile.summary.is_(None),
+            or_(CandidateProfile.summary_retry_at.is_(None), CandidateProfile.summary_retry_at <= now)
+        )
+        .values(summary_retry_at=now + timedelta(minutes=settings.PROFILE_SUMMARY_LEASE_MINUTES))
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+
+    summary = summarize_resume(resume_text)
+
+    if summary:
+        values = {"summary": summary, "summary_retry_at": None}
+    else:
+        # Failure marker: retried with exponential backoff instead of on every scoring
+        attempts = (db.query(CandidateProfile.summary_attempts).filter(CandidateProfile.id == profile_id).scalar() or 0) + 1
+        delay = min(settings.PROFILE_SUMMARY_RETRY_MINUTES * 2 ** (attempts - 1), 24 * 60)
+        values = {"summary_attempts": attempts, "summary_retry_at": datetime.now(timezone.utc) + timedelta(minutes=delay)}
+        print(f"⚠️ Summary of profile {profile_id} failed (attempt {attempts}), next try in {delay} min")
+    db.execute(update(CandidateProfile).where(CandidateProfile.id == profile_id).values(**values))
+    db.commit()
+    return summary
+
+
+def profile_prompt_text(db: Session, profile: CandidateProfile) -> str:
+    """
+    Compact candidate description for scoring prompts (falls back to full text).
+    A profile with a single application is scored on its full text: summarizing it
+    first would cost a second LLM call for nothing.
+    """
+    if not profile.summary:
+        applications = db.query(func.count(Application.id)).filter(Application.profile_id == profile.id).scalar()
+        if applications <= 1:
+            return profile.resume_text or ""
+
+    summary = ensure_profile_summary(db, profile)
+    if summary:
+        return json.dumps(summary, indent=1)
+    return profile.resume_text or ""
+
+
+# --- Talent Pool (reverse matching: new job -> past candidates) ---
+
+def search_talent_pool(db: Session, job: Job, limit: int):
+    """
+    Ranks every past candidate of the company against the job via the HNSW index on
+    candidate_profiles.embedding (no LLM, no re-scoring of stored resumes).
+    One row per email (their closest resume); people who already applied to this job are skipped.
+    """
+    job_vector = ensure_job_embedding(db, job)
+    if job_vector is None:
+        return []
+
+    started_at = time.perf_counter()
+    # NULL emails (bulk imports still being scanned, or whose scan failed) must be left out:
+    # "x NOT IN (..., NULL)" is never true and would empty the whole talent pool
+    applied_emails = db.query(Application.candidate_email).filter(
+        Application.job_id == job.id, Application.candidate_email.isnot(None)
+    )
+    dist = distance(CandidateProfile.embedding, job_vector).label("distance")
+
+    query = db.query(CandidateProfile.id, CandidateProfile.email, CandidateProfile.full_name, dist)\
+        .filter(
+            CandidateProfile.company_id == job.company_id,
+            CandidateProfile.embedding.isnot(None),
+            CandidateProfile.email.not_in(applied_emails)
+        )\
+        .order_by(dist)
+
+    def closest_per_email(rows):
+        # relaxed_order iterative scans may return rows slightly out of order
+        matches, seen = [], set()
+        for profile_id, email, full_name, row_distance in sorted(rows, key=lambda row: row[3]):
+            if email in seen:
+                continue
+            seen.add(email)
+            matches.append({
+                "profile_id": profile_id,
+                "candidate_name": full_name,
+                "candidate_email": email,
+                "similarity": round(max(0.0, distance_to_similarity(row_distance)) * 100, 2),
+            })
+            if len(matches) == limit:
+                break
+        return matches
+
+    # Over-fetch: a candidate can have several resume versions. The tenant / email filters are
+    # applied after the ANN scan, so a short result falls back to an exact scan of this company.
+    rows = nearest(db, query, limit * 3, enough=lambda rows: len(closest_per_email(rows)) >= limit)
+    matches = closest_per_email(rows)
+
+    print(f"🔎 Talent pool for job {job.id}: {len(matches)} matches in {(time.perf_counter() - started_at) * 1000:.1f} ms")
+    return matches
+
+
+def backfill_profiles_from_applications(db: Session, company_id: int) -> int:
+    """
+    Applications scanned before candidate profiles existed only have resume_text.
+    Turns them into profiles (keyed by the text hash) so they show up in the talent pool.
+    """
+    applications = db.query(Application).join(Job).filter(
+        Job.company_id == company_id,
+        Application.profile_id.is_(None),
+        Application.resume_text.isnot(None)
+    ).all()
+
+    created = 0
+    for application in applications:
+        text_hash = hashlib.sha256(application.resume_text.encode("utf-8")).hexdigest()
+        profile = db.query(CandidateProfile).filter(
+            CandidateProfile.company_id == company_id,
+            CandidateProfile.email == application.candidate_email,
+            CandidateProfile.file_hash == text_hash
+        ).first()
+        if not profile:
+            embedding = application.resume_embedding
+            profile = CandidateProfile(
+                company_id=company_id,
+                email=application.candidate_email,
+                full_name=application.candidate_name,
+                file_hash=text_hash,
+                resume_text=application.resume_text,
+                skills=extract_skills(application.resume_text),
+                embedding=embedding if embedding is not None else embed_long_text(application.resume_text)
+            )
+            db.add(profile)
+            db.flush()
+            created += 1
+        application.profile_id = profile.id
+    db.commit()
+    return created
@@ -0,0 +1,106 @@
+import io
+import struct
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import DocumentChunk
+
+# Bulk writer for document_chunks rows.
+# "copy":        COPY ... FROM STDIN (FORMAT BINARY) - one round trip, vectors sent as raw float4
+#                (pgvector's binary format), no text parsing on the server. Needs psycopg2.
+# "executemany": SQLAlchemy insertmanyvalues - multi-row INSERT statements, ~1000 rows per round trip.
+
+
+def _encode_int4(value) -> bytes:
+    return struct.pack(">i", int(value))
+
+
+def _encode_bool(value) -> bytes:
+    return b"\x01" if value else b"\x00"
+
+
+def _encode_text(value) -> bytes:
+    # Postgres text cannot contain NUL bytes (PDF extraction sometimes produces them)
+    return str(value).replace("\x00", "").encode("utf-8")
+
+
+def _encode_vector(value) -> bytes:
+    # pgvector binary format: int16 dim, int16 unused, float4[dim] (network byte order)
+    dim = len(value)
+    return struct.pack(f">hh{dim}f", dim, 0, *value)
+
+
+# Column order used for COPY (id is left to the sequence)
+_CHUNK_COLUMNS = [
+    ("document_id", _encode_int4),
+    ("company_id", _encode_int4),
+    ("ordinal", _encode_int4),
+    ("generation", _encode_int4),
+    ("ready", _encode_bool),
+    ("content", _encode_text),
+    ("content_hash", _encode_text),
+    ("embedding", _encode_vector),
+]
+
+# COPY doesn't apply column defaults to columns it lists
+_CHUNK_DEFAULTS = {"generation": 0, "ready": True}
+
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+
+
+def _build_copy_buffer(rows: list[dict]) -> io.BytesIO:
+    buffer = io.BytesIO()
+    buffer.write(_COPY_HEADER)
+    field_count = struct.pack(">h", len(_CHUNK_COLUMNS))
+
+    for row in rows:
+        buffer.write(field_count)
+        for column, encode in _CHUNK_COLUMNS:
+            value = row.get(column, _CHUNK_DEFAULTS.get(column))
+            if value is None:
+                buffer.write(struct.pack(">i", -1))
+                continue
+            data = encode(value)
+            buffer.write(struct.pack(">i", len(data)))
+            buffer.write(data)
+
+    buffer.write(_COPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_rows(db: Session, rows: list[dict]):
+    columns = ", ".join(column for column, _ in _CHUNK_COLUMNS)
+    sql = f"COPY {DocumentChunk.__tablename__} ({columns}) FROM STDIN WITH (FORMAT BINARY)"
+
+    # Raw DBAPI connection of the session's current transaction (commit stays with the caller)
+    raw_connection = db.connection().connection
+    with raw_connection.cursor() as cursor:
+        cursor.copy_expert(sql, _build_copy_buffer(rows))
+
+
+def _executemany_rows(db: Session, rows: list[dict]):
+    for row in rows:
+        if row.get("content"):
+            row["content"] = row["content"].replace("\x00", "")
+    db.execute(insert(DocumentChunk), rows)
+
+
+def bulk_insert_chunks(db: Session, rows: list[dict], mode: str | None = None):
+    """
+    Inserts many document_chunks rows in the session's transaction.
+    rows: dicts with document_id, company_id, ordinal, generation, ready, content, content_hash, embedding.
+    mode: "copy" | "executemany" (default: CHUNK_WRITE_MODE). COPY falls back to
+    executemany when the driver is not psycopg2.
+    """
+    if not rows:
+        return
+
+    mode = mode or settings.CHUNK_WRITE_MODE
+    if mode == "copy" and db.get_bind().dialect.driver == "psycopg2":
+        _copy_rows(db, rows)
+    else:
+        _executemany_rows(db, rows)
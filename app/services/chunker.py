@@ -0,0 +1,144 @@
+import os
+import re
+import threading
+
+from app.config import settings
+
+# Tokenizers' Rust thread pool does not survive fork() (Celery prefork); keep it single-threaded
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# A "unit" is a sentence or a line: text up to and including . ! ? or newlines (+ trailing spaces),
+# or the trailing text without a terminator. Concatenating all units gives back the original text.
+_UNIT_RE = re.compile(r"[^.!?\n]*(?:[.!?]+|\n+)\s*|[^.!?\n]+")
+
+
+class TokenChunker:
+    """
+    Splits text into chunks sized by the embedding model's own tokenizer, so no chunk
+    exceeds the model window (all-MiniLM-L6-v2: 256 tokens incl. [CLS]/[SEP]) and gets
+    silently truncated at embedding time.
+
+    Sentences/lines are packed greedily up to max_tokens; the last sentences of a chunk
+    (up to overlap_tokens) are repeated at the start of the next one. A single sentence
+    longer than max_tokens is cut on token boundaries.
+    """
+
+    def __init__(self, tokenizer, max_tokens: int, overlap_tokens: int):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def count_tokens(self, texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def _token_windows(self, unit: str) -> list[tuple[int, int]]:
+        """(start, end) character spans of consecutive max_tokens-token windows of unit."""
+        encoded = self.tokenizer(unit, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoded["offset_mapping"]
+        return [
+            (offsets[start][0], offsets[min(start + self.max_tokens, len(offsets)) - 1][1])
+            for start in range(0, len(offsets), self.max_tokens)
+        ]
+
+    def _split_long_unit(self, unit: str):
+        for start, end in self._token_windows(unit):
+            piece = unit[start:end].strip()
+            if piece:
+                yield piece
+
+    def _cut_carry(self, carry: str):
+        """
+        A segment without sentence terminators (tables, OCR text...) would keep growing carry
+        until the whole document is in memory. Once carry is over max_tokens, every full token
+        window is split off; only the last (possibly unfinished) window stays as carry.
+        Returns (pieces, carry).
+        """
+        # A token covers at least one character, so short strings can't be over the limit
+        if len(carry) <= self.max_tokens or self.count_tokens([carry])[0] <= self.max_tokens:
+            return [], carry
+        starts = [start for start, _ in self._token_windows(carry)]
+        starts[0] = 0
+        pieces = [carry[start:end] for start, end in zip(starts, starts[1:])]
+        return pieces, carry[starts[-1]:]
+
+    def stream(self, segments):
+        """Yields chunks from an iterable of text segments (pages, paragraphs, ...)."""
+        current = []          # [(unit, tokens)] of the chunk being built
+        current_tokens = 0
+        carry = ""            # last, possibly incomplete unit of the previous segment
+
+        def emit():
+            text = "".join(unit for unit, _ in current).strip()
+            return text or None
+
+        def process(units):
+            nonlocal current, current_tokens
+            for unit, tokens in zip(units, self.count_tokens(units)):
+                if tokens > self.max_tokens:
+                    if current:
+                        chunk = emit()
+                        if chunk:
+                            yield chunk
+                    current, current_tokens = [], 0
+                    yield from self._split_long_unit(unit)
+                    continue
+
+                if current and current_tokens + tokens > self.max_tokens:
+                    chunk = emit()
+                    if chunk:
+                        yield chunk
+                    # Keep the tail of the previous chunk as overlap
+                    while current and (current_tokens > self.overlap_tokens
+                                       or current_tokens + tokens > self.max_tokens):
+                        _, dropped = current.pop(0)
+                        current_tokens -= dropped
+
+                current.append((unit, tokens))
+                current_tokens += tokens
+
+        for segment in segments:
+            units = _UNIT_RE.findall(carry + segment)
+            carry = units.pop() if units else ""
+            yield from process(units)
+            pieces, carry = self._cut_carry(carry)
+            yield from process(pieces)
+
+        if carry:
+            yield from process([carry])
+        if current:
+            chunk = emit()
+            if chunk:
+                yield chunk
+
+    def split_text(self, text: str) -> list[str]:
+        return list(self.stream([text]))
+
+
+_chunker = None
+_chunker_lock = threading.Lock()
+
+
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+    model_name = settings.EMBEDDING_MODEL_NAME
+    # sentence-transformers resolves short model names inside its own org
+    if "/" not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+
+def get_chunker() -> TokenChunker:
+    """Process-wide chunker (the tokenizer is loaded once and reused by every call)."""
+    global _chunker
+    if _chunker is None:
+        with _chunker_lock:
+            if _chunker is None:
+                _chunker = TokenChunker(
+                    _load_tokenizer(),
+                    max_tokens=settings.CHUNK_MAX_TOKENS,
+                    overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+                )
+    return _chunker
@@ -1,54 +1,138 @@
 import os
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from PyPDF2 import PdfReader
 import docx
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.config import settings
+from app.services.chunker import get_chunker
+from app.services.storage import get_blob_store
 
 def extract_text_from_file(file_path: str) -> str:
     """
     Detects file type and extracts text accordingly.
     Supports: .pdf, .docx, .txt
     """
-    ext = os.path.splitext(file_path)[1].lower()
-    
     try:
-        if ext == ".pdf":
-            return _extract_from_pdf(file_path)
-        elif ext == ".docx":
-            return _extract_from_docx(file_path)
-        elif ext == ".txt":
-            return _extract_from_txt(file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {ext}")
+        return "".join(iter_text_segments(file_path))
     except Exception as e:
         print(f"❌ Error extracting text from {file_path}: {e}")
         return ""
 
-def _extract_from_pdf(file_path):
-    text = ""
+def iter_text_segments(file_path: str):
+    """
+    Streams the text of a file piece by piece (a page for PDFs, a paragraph for DOCX,
+    a block for TXT) so the whole document never has to sit in memory at once.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == ".pdf":
+        return iter_pdf_pages(file_path)
+    elif ext == ".docx":
+        return _iter_docx_paragraphs(file_path)
+    elif ext == ".txt":
+        return _iter_txt_blocks(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+# --- PDF ---
+
+def _extract_page_range(file_path: str, start: int, end: int) -> list[str]:
+    """Extracts pages [start, end). Top-level so it can run in a worker process."""
+    with open(file_path, "rb") as f:
+        reader = PdfReader(f)
+        return [(reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+def _iter_pdf_pages_parallel(file_path: str, page_count: int, workers: int):
+    # Page ranges are submitted through a bounded window: results are yielded in order
+    # and at most 2 * workers ranges are held in memory at any time.
+    step = settings.PDF_PAGES_PER_TASK
+    ranges = iter(range(0, page_count, step))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for start in ranges:
+            window.append(pool.submit(_extract_page_range, file_path, start, min(start + step, page_count)))
+            if len(window) >= workers * 2:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+def iter_pdf_pages(file_path: str):
+    """
+    Yields the text of each PDF page ("\n" terminated, empty pages skipped).
+    PDFs with >= PDF_PARALLEL_MIN_PAGES pages are extracted by a process pool
+    (PDF_EXTRACT_PROCESSES > 1). Falls back to sequential extraction where child
+    processes are not allowed (e.g. inside a daemonic Celery prefork child).
+    """
+    started_at = time.perf_counter()
+    with open(file_path, "rb") as f:
+        page_count = len(PdfReader(f).pages)
+
+    pages = None
+    workers = settings.PDF_EXTRACT_PROCESSES
+    if workers > 1 and page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+        try:
+            pages = _iter_pdf_pages_parallel(file_path, page_count, workers)
+            first_page = next(pages, None)
+            if first_page is not None:
+                pages = _prepend(first_page, pages)
+        except (AssertionError, OSError) as e:
+            print(f"⚠️ Parallel PDF extraction unavailable ({e}), extracting sequentially")
+            pages = None
+
+    if pages is None:
+        pages = _iter_pdf_pages_sequential(file_path)
+
+    for page_text in pages:
+        if page_text:
+            yield page_text + "\n"
+
+    elapsed = time.perf_counter() - started_at
+    print(f"📑 Extracted {page_count} pages in {elapsed:.2f}s "
+          f"({elapsed * 1000 / page_count if page_count else 0:.1f} ms/page)")
+
+def _iter_pdf_pages_sequential(file_path: str):
     with open(file_path, "rb") as f:
         reader = PdfReader(f)
         for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+            yield page.extract_text() or ""
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
 
-def _extract_from_docx(file_path):
+# --- DOCX / TXT ---
+
+def _iter_docx_paragraphs(file_path):
     doc = docx.Document(file_path)
-    return "\n".join([para.text for para in doc.paragraphs])
+    for i, para in enumerate(doc.paragraphs):
+        yield para.text if i == 0 else "\n" + para.text
 
-def _extract_from_txt(file_path):
+def _iter_txt_blocks(file_path, block_size: int = 64 * 1024):
     with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
+        for block in iter(lambda: f.read(block_size), ""):
+            yield block
+
+def extract_text_from_blob(key: str) -> str:
+    """extract_text_from_file() for an upload in the blob store (downloaded only if the backend is remote)."""
+    with get_blob_store().local_copy(key) as file_path:
+        return extract_text_from_file(file_path)
+
+def hash_chunk(chunk_text: str) -> str:
+    return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
 
-def create_chunks(text: str, chunk_size=1000, overlap=200):
+def create_chunks(text: str):
     """
     Splits text into smart chunks with overlap for better context.
     Overlap ensure karta hai ki baat beech me na kate.
+    Chunks are sized in model tokens (CHUNK_MAX_TOKENS), so none gets truncated at embedding time.
+    """
+    return get_chunker().split_text(text)
+
+def stream_chunks(segments):
+    """
+    Incremental version of create_chunks() over a stream of text segments
+    (only the chunk being built is held in memory).
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=overlap,
-        separators=["\n\n", "\n", ".", " ", ""]
-    )
-    return splitter.split_text(text)
\ No newline at end of file
+    return get_chunker().stream(segments)
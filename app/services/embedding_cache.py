@@ -0,0 +1,127 @@
+import hashlib
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+import redis
+
+
+def normalize_text(text: str, lowercase: bool = False) -> str:
+    """
+    Collapses whitespace, and lower-cases the text only for uncased models
+    (all-MiniLM-L6-v2's tokenizer is uncased, so case does not change its vector).
+    """
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.lower() if lowercase else text
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for embedding vectors, keyed by (model name, sha256 of normalized text).
+    Tier 1: in-process LRU (bounded by max_items).
+    Tier 2: shared Redis, so API and Celery processes reuse each other's vectors.
+    Redis errors are never fatal - the cache just falls back to the model.
+    """
+
+    def __init__(self, model_name: str, max_items: int, redis_url: str | None, ttl_seconds: int,
+                 lowercase: bool = False):
+        self.model_name = model_name
+        self.lowercase = lowercase
+        self.max_items = max_items
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    # --- Keys & Serialization ---
+    def make_key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text, self.lowercase).encode("utf-8")).hexdigest()
+        return f"emb:{self.model_name}:{digest}"
+
+    @staticmethod
+    def _pack(vector) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(raw: bytes) -> list[float]:
+        vector = array("f")
+        vector.frombytes(raw)
+        return vector.tolist()
+
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.5)
+        return self._redis
+
+    # --- Tier 1 ---
+    def _memory_get(self, key):
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _memory_put(self, key, vector):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats[name] += n
+
+    # --- Public API ---
+    def get_many(self, texts: list[str]) -> list:
+        """Returns a list aligned with texts: cached vector or None."""
+        keys = [self.make_key(t) for t in texts]
+        results = [self._memory_get(k) for k in keys]
+        self._count("memory_hits", sum(1 for r in results if r is not None))
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            try:
+                client = self._get_redis()
+                raw_values = client.mget([keys[i] for i in missing]) if client else [None] * len(missing)
+            except Exception as e:
+                print(f"⚠️ Embedding cache Redis read failed: {e}")
+                raw_values = [None] * len(missing)
+
+            for i, raw in zip(missing, raw_values):
+                if raw is None:
+                    continue
+                vector = self._unpack(raw)
+                results[i] = vector
+                self._memory_put(keys[i], vector)
+                self._count("redis_hits")
+
+        self._count("misses", sum(1 for r in results if r is None))
+        return results
+
+    def put_many(self, texts: list[str], vectors: list):
+        keys = [self.make_key(t) for t in texts]
+        for key, vector in zip(keys, vectors):
+            self._memory_put(key, vector)
+
+        try:
+            client = self._get_redis()
+            if client:
+                pipe = client.pipeline(transaction=False)
+                for key, vector in zip(keys, vectors):
+                    pipe.set(key, self._pack(vector), ex=self.ttl_seconds)
+                pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Embedding cache Redis write failed: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_items"] = len(self._lru)
+        lookups = stats["memory_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,51 @@
+import json
+
+import redis
+
+from app.config import settings
+
+# Live status events: Celery tasks publish to Redis pub/sub, /api/events/stream pushes them to
+# the dashboard over SSE. One channel per company, so a client only ever sees its own company.
+# Fire-and-forget: a missed event only means the UI shows the next one (or refetches).
+
+
+def company_channel(company_id: int) -> str:
+    return f"events:company:{company_id}"
+
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1.0)
+    return _client
+
+
+def publish_event(company_id: int, event_type: str, payload: dict):
+    if not company_id:
+        return
+    try:
+        _get_client().publish(company_channel(company_id), json.dumps({"type": event_type, **payload}, default=str))
+    except redis.RedisError as e:
+        print(f"⚠️ Could not publish {event_type} event: {e}")
+
+
+def publish_application(application, company_id: int):
+    """Status / score change of an ATS application."""
+    publish_event(company_id, "application", {
+        "id": application.id,
+        "job_id": application.job_id,
+        "batch_id": application.batch_id,
+        "status": application.status,
+        "pre_score": application.pre_score,
+        "match_score": application.match_score,
+        "ai_feedback": application.ai_feedback,
+        "missing_skills": application.missing_skills,
+    })
+
+
+def publish_document(document_id: int, company_id: int, **fields):
+    """Progress of a policy document (status, chunks_done / chunks_total, error...)."""
+    publish_event(company_id, "document", {"id": document_id, **fields})
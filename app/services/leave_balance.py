@@ -0,0 +1,112 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import Integer, and_, case, cast, extract, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import DataMigration, LeaveBalance, LeaveRequest, User
+
+# Leave balance ledger: one row per (user, year) with the approved days and request count.
+# Every status change into / out of "Approved" adjusts it with an upsert in the SAME transaction
+# as the status change, so the ledger and leave_requests can't drift apart. The rebuild job
+# recomputes it from leave_requests for consistency checks or after manual DB edits.
+
+APPROVED = "Approved"
+
+_YEAR_RE = re.compile(r"^(\d{4})-")
+
+
+def leave_year(start_date: str | None, created_at: datetime | None = None) -> int:
+    """Year a leave counts against: its start date (YYYY-MM-DD), else when it was applied."""
+    match = _YEAR_RE.match(start_date or "")
+    if match:
+        return int(match.group(1))
+    return (created_at or datetime.now()).year
+
+
+def _leave_year_sql():
+    # Same rule as leave_year(), in SQL (used by the rebuild)
+    return case(
+        (LeaveRequest.start_date.op("~")(r"^[0-9]{4}-"), cast(func.substr(LeaveRequest.start_date, 1, 4), Integer)),
+        else_=cast(extract("year", LeaveRequest.created_at), Integer),
+    )
+
+
+def adjust_balance(db: Session, user_id: int, year: int, days: int, count: int):
+    """Atomic += on the (user, year) row, created on first use. Caller commits."""
+    statement = insert(LeaveBalance).values(user_id=user_id, year=year, days_used=days, approved_count=count)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[LeaveBalance.user_id, LeaveBalance.year],
+        set_={
+            "days_used": LeaveBalance.days_used + statement.excluded.days_used,
+            "approved_count": LeaveBalance.approved_count + statement.excluded.approved_count,
+            "updated_at": func.now(),
+        },
+    ))
+
+
+def record_status_change(db: Session, user_id: int, days_count: int, start_date: str | None,
+                         old_status: str | None, new_status: str, created_at: datetime | None = None):
+    """Call whenever a leave's status changes (old_status=None for a new leave)."""
+    was_approved = old_status == APPROVED
+    is_approved = new_status == APPROVED
+    if was_approved == is_approved:
+        return
+    sign = 1 if is_approved else -1
+    adjust_balance(db, user_id, leave_year(start_date, created_at), sign * (days_count or 0), sign)
+
+
+def rebuild_balances(db: Session, company_id: int | None = None) -> int:
+    """Recomputes the ledger from approved leave requests (whole table or one company)."""
+    user_ids = select(User.id)
+    if company_id is not None:
+        user_ids = user_ids.where(User.company_id == company_id)
+
+    # Blocks concurrent status changes until the rebuild commits (they then apply on top of it)
+    db.execute(text("LOCK TABLE leave_balances IN SHARE ROW EXCLUSIVE MODE"))
+    db.query(LeaveBalance).filter(LeaveBalance.user_id.in_(user_ids)).delete(synchronize_session=False)
+
+    year = _leave_year_sql()
+    totals = select(
+        LeaveRequest.user_id,
+        year.label("year"),
+        func.coalesce(func.sum(LeaveRequest.days_count), 0),
+        func.count(LeaveRequest.id),
+    ).where(
+        and_(LeaveRequest.status == APPROVED, LeaveRequest.user_id.in_(user_ids))
+    ).group_by(LeaveRequest.user_id, year)
+
+    result = db.execute(
+        insert(LeaveBalance).from_select(["user_id", "year", "days_used", "approved_count"], totals)
+    )
+    db.commit()
+    return result.rowcount
+
+
+BACKFILL_LOCK_ID = 7_310_003
+BACKFILL_MIGRATION = "leave_balances_backfill"
+
+
+def backfill_once(db: Session) -> bool:
+    """
+    First start after the ledger was introduced: build it from the existing approved leaves.
+
+    Completion is recorded in data_migrations, in the same transaction as the rebuild. An empty
+    ledger is no marker: a leave approved before the backfill ran (replica serving first,
+    DB_SETUP_ON_STARTUP off) would make it skip forever and lose every historical approval.
+    A transaction-level advisory lock (held until the rebuild commits) makes processes that
+    start together skip it instead of queueing up to redo the delete + insert.
+    """
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": BACKFILL_LOCK_ID}).scalar():
+        db.rollback()
+        return False
+    if db.get(DataMigration, BACKFILL_MIGRATION) is not None:
+        db.rollback()
+        return False
+    # Full rebuild, so rows written by approvals made before this ran are recomputed too
+    db.add(DataMigration(name=BACKFILL_MIGRATION))
+    db.flush()
+    rows = rebuild_balances(db)
+    print(f"🧮 Leave balance ledger initialised ({rows} rows)")
+    return True
@@ -0,0 +1,94 @@
+import re
+from functools import lru_cache
+
+# Per-company leave rules, evaluated locally (no LLM) when a leave is applied.
+# Clear cases are decided here; only requests no rule covers go to the AI triage task.
+#
+# Order of evaluation:
+#   1. days >= review.min_days                        -> Human-Review
+#   2. reason mentions a review keyword (trip, ...)   -> Human-Review
+#   3. reason mentions an auto-approve keyword AND
+#      days <= auto_approve.max_days                  -> Auto-Approve
+#      unless the keyword is negated ("not sick"), part of a hyphenated word ("ill-timed")
+#      or the reason contains an exclude phrase ("cold feet")  -> ambiguous (AI triage)
+#   4. anything else                                  -> ambiguous (AI triage)
+
+DEFAULT_LEAVE_RULES = {
+    "auto_approve": {
+        "keywords": ["sick", "fever", "ill", "illness", "flu", "cold", "personal", "doctor", "medical"],
+        "exclude": ["cold feet", "cold shoulder", "sick of", "sick and tired"],
+        "max_days": 2,
+    },
+    "review": {
+        "keywords": ["vacation", "trip", "holiday", "travel", "tour", "wedding", "honeymoon"],
+        "min_days": 4,
+    },
+}
+
+
+def merge_rules(company_rules: dict | None) -> dict:
+    """Company overrides on top of the defaults (missing sections / fields keep the default)."""
+    rules = {section: dict(values) for section, values in DEFAULT_LEAVE_RULES.items()}
+    for section, values in (company_rules or {}).items():
+        if section in rules and isinstance(values, dict):
+            rules[section].update({k: v for k, v in values.items() if v is not None})
+    return rules
+
+
+# Words that flip the meaning of a keyword shortly after them ("not sick", "no fever", "isn't ill")
+_NEGATIONS = {"not", "no", "never", "without", "nor", "neither"}
+_NEGATION_WINDOW = 3  # words before the keyword
+
+
+@lru_cache(maxsize=256)
+def _keyword_pattern(keywords: tuple[str, ...]):
+    if not keywords:
+        return None
+    alternatives = "|".join(re.escape(keyword.strip().lower()) for keyword in keywords if keyword.strip())
+    # Whole words only, and not part of a hyphenated word ("ill-timed", "self-ill")
+    return re.compile(rf"(?<![\w-])(?:{alternatives})(?![\w-])") if alternatives else None
+
+
+def _find_keyword(keywords, text: str):
+    pattern = _keyword_pattern(tuple(keywords or ()))
+    match = pattern.search(text) if pattern else None
+    return match.group(0) if match else None
+
+
+def _is_negated(text: str, start: int) -> bool:
+    words = re.findall(r"[a-z']+", text[:start])[-_NEGATION_WINDOW:]
+    return any(word in _NEGATIONS or word.endswith("n't") for word in words)
+
+
+def _find_affirmed_keyword(keywords, text: str):
+    """First keyword in text, or None when any occurrence is negated (then a human / the AI decides)."""
+    pattern = _keyword_pattern(tuple(keywords or ()))
+    matches = list(pattern.finditer(text)) if pattern else []
+    if not matches or any(_is_negated(text, match.start()) for match in matches):
+        return None
+    return matches[0].group(0)
+
+
+def evaluate_leave(company_rules: dict | None, reason: str, days: int):
+    """
+    Returns {"recommendation": "Auto-Approve" | "Human-Review", "reason": ...} for clear cases,
+    None when no rule decides it.
+    """
+    rules = merge_rules(company_rules)
+    text = (reason or "").lower()
+    review, auto = rules["review"], rules["auto_approve"]
+
+    if review.get("min_days") and days >= review["min_days"]:
+        return {"recommendation": "Human-Review", "reason": f"Rule: {days} days (review from {review['min_days']} days)"}
+
+    keyword = _find_keyword(review.get("keywords"), text)
+    if keyword:
+        return {"recommendation": "Human-Review", "reason": f"Rule: '{keyword}' leave needs review"}
+
+    if _find_keyword(auto.get("exclude"), text):
+        return None
+    keyword = _find_affirmed_keyword(auto.get("keywords"), text)
+    if keyword and days <= auto.get("max_days", 0):
+        return {"recommendation": "Auto-Approve", "reason": f"Rule: '{keyword}' leave of {days} day(s)"}
+
+    return None
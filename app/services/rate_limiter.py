@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+
+import redis
+import redis.asyncio as aioredis
+from groq import RateLimitError
+
+from app.config import settings
+
+# Global Groq limiter shared by every API and Celery process (Redis token buckets).
+# Two buckets refill continuously: requests/minute and tokens/minute. A call is admitted
+# only when both have room. Priority classes:
+#   interactive : chat / leave requests - may use the whole bucket
+#   batch       : ATS scoring - must leave GROQ_BATCH_RESERVE of each bucket for interactive calls
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_BUCKET_KEYS = ["groq:ratelimit:requests", "groq:ratelimit:tokens"]
+
+# KEYS: bucket keys. ARGV: reserve fraction, then (capacity, cost) per bucket.
+# Returns 0 when admitted (costs deducted from every bucket), else the wait in ms.
+_TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local reserve = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i])
+    local cost = tonumber(ARGV[2 * i + 1])
+    local rate = capacity / 60000.0
+    local state = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    levels[i] = level
+
+    local needed = math.min(capacity, cost + capacity * reserve)
+    if level < needed then
+        wait = math.max(wait, math.ceil((needed - level) / rate))
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    local level = levels[i]
+    if wait == 0 then
+        level = level - tonumber(ARGV[2 * i + 1])
+    end
+    redis.call('HSET', key, 'level', level, 'ts', now)
+    redis.call('PEXPIRE', key, 120000)
+end
+return wait
+"""
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+_sync_script = None
+_async_script = None
+
+
+def _get_sync_script():
+    global _sync_script
+    if _sync_script is None:
+        client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1.0)
+        _sync_script = client.register_script(_TOKEN_BUCKET_LUA)
+    return _sync_script
+
+
+def _get_async_script():
+    global _async_script
+    if _async_script is None:
+        client = aioredis.Redis.from_url(settings.REDIS_URL, socket_timeout=1.0)
+        _async_script = client.register_script(_TOKEN_BUCKET_LUA)
+    return _async_script
+
+
+def estimate_tokens(messages: list[dict], max_output_tokens: int | None = None) -> int:
+    """Rough prompt size (~4 chars per token) + expected completion size."""
+    prompt_chars = sum(len(message["content"]) for message in messages)
+    return prompt_chars // 4 + (max_output_tokens or settings.GROQ_EST_OUTPUT_TOKENS)
+
+
+def _script_args(tokens: int, priority: str):
+    reserve = settings.GROQ_BATCH_RESERVE if priority == BATCH else 0.0
+    return [reserve, settings.GROQ_REQUESTS_PER_MINUTE, 1, settings.GROQ_TOKENS_PER_MINUTE, tokens]
+
+
+def _timeout_for(priority: str) -> float:
+    return settings.GROQ_BATCH_MAX_WAIT_SECONDS if priority == BATCH else settings.GROQ_INTERACTIVE_MAX_WAIT_SECONDS
+
+
+def acquire(tokens: int, priority: str = INTERACTIVE):
+    """Blocks until the shared buckets admit this call. Fails open if Redis is down."""
+    deadline = time.monotonic() + _timeout_for(priority)
+    while True:
+        try:
+            wait_ms = _get_sync_script()(keys=_BUCKET_KEYS, args=_script_args(tokens, priority))
+        except redis.RedisError as e:
+            print(f"⚠️ Rate limiter unavailable, continuing without it: {e}")
+            return
+        if not wait_ms:
+            return
+        if time.monotonic() + wait_ms / 1000 > deadline:
+            raise RateLimitTimeout(f"Groq rate limit: no capacity for {priority} call")
+        # Small jitter so waiting processes don't all retry in the same millisecond
+        time.sleep(wait_ms / 1000 + random.uniform(0, 0.05))
+
+
+async def aacquire(tokens: int, priority: str = INTERACTIVE):
+    """Async version of acquire() (never blocks the event loop)."""
+    deadline = time.monotonic() + _timeout_for(priority)
+    while True:
+        try:
+            wait_ms = await _get_async_script()(keys=_BUCKET_KEYS, args=_script_args(tokens, priority))
+        except redis.RedisError as e:
+            print(f"⚠️ Rate limiter unavailable, continuing without it: {e}")
+            return
+        if not wait_ms:
+            return
+        if time.monotonic() + wait_ms / 1000 > deadline:
+            raise RateLimitTimeout(f"Groq rate limit: no capacity for {priority} call")
+        await asyncio.sleep(wait_ms / 1000 + random.uniform(0, 0.05))
+
+
+def _backoff_delay(error: RateLimitError, attempt: int) -> float:
+    """Full-jitter exponential backoff; honours the provider's Retry-After header when present."""
+    retry_after = None
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+
+    ceiling = min(settings.GROQ_BACKOFF_MAX_SECONDS, settings.GROQ_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    delay = random.uniform(0, ceiling)
+    return max(delay, retry_after) if retry_after else delay
+
+
+def call_with_rate_limit(fn, messages: list[dict], priority: str = INTERACTIVE, max_output_tokens: int | None = None):
+    """Runs fn() (a Groq call) under the shared limiter, retrying 429s with backoff."""
+    tokens = estimate_tokens(messages, max_output_tokens)
+    for attempt in range(settings.GROQ_MAX_RETRIES + 1):
+        acquire(tokens, priority)
+        try:
+            return fn()
+        except RateLimitError as e:
+            if attempt == settings.GROQ_MAX_RETRIES:
+                raise
+            delay = _backoff_delay(e, attempt)
+            print(f"⏳ Groq 429 ({priority}), retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def acall_with_rate_limit(fn, messages: list[dict], priority: str = INTERACTIVE, max_output_tokens: int | None = None):
+    """Async version of call_with_rate_limit(); fn returns an awaitable."""
+    tokens = estimate_tokens(messages, max_output_tokens)
+    for attempt in range(settings.GROQ_MAX_RETRIES + 1):
+        await aacquire(tokens, priority)
+        try:
+            return await fn()
+        except RateLimitError as e:
+            if attempt == settings.GROQ_MAX_RETRIES:
+                raise
+            delay = _backoff_delay(e, attempt)
+            print(f"⏳ Groq 429 ({priority}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,103 @@
+import csv
+import io
+import os
+import zipfile
+
+from app.config import settings
+from app.services.storage import BlobTooLarge, save_upload
+
+# Bulk resume intake: a ZIP export from a job board, or many files + a CSV manifest.
+# Entries are streamed one by one from the archive to the blob store (hashing on the way),
+# the archive itself is never read into memory.
+
+RESUME_EXTENSIONS = {".pdf", ".docx", ".txt"}
+
+
+def read_manifest(fileobj) -> dict:
+    """
+    CSV with columns filename, name, email (candidate_name / candidate_email also accepted).
+    Returns {lowercase file name: (name, email)}.
+    """
+    rows = {}
+    reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+        filename = os.path.basename(row.get("filename") or row.get("file") or "")
+        if filename:
+            rows[filename.lower()] = (
+                row.get("name") or row.get("candidate_name") or None,
+                (row.get("email") or row.get("candidate_email") or "").lower() or None,
+            )
+    return rows
+
+
+def _iter_zip_entries(archive):
+    """Yields (file name, size, opener) for each regular file in the ZIP."""
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            yield os.path.basename(info.filename), info.file_size, lambda info=info: zf.open(info)
+
+
+def _iter_upload_entries(files):
+    for upload in files:
+        yield os.path.basename(upload.filename or ""), upload.size, lambda upload=upload: upload.file
+
+
+def stage_resumes(prefix: str, archive=None, files=None, manifest=None):
+    """
+    Streams every resume into the blob store under prefix and returns (entries, skipped).
+    entries: [{"blob_key", "file_hash", "candidate_name", "candidate_email"}]
+    A manifest.csv inside the ZIP is used when no manifest upload is given.
+    """
+    max_bytes = settings.BULK_IMPORT_MAX_FILE_MB * 1024 * 1024
+
+    contacts = read_manifest(manifest) if manifest else {}
+    if archive is not None and not contacts:
+        with zipfile.ZipFile(archive) as zf:
+            manifest_name = next((name for name in zf.namelist() if name.lower().endswith(".csv")), None)
+            if manifest_name:
+                with zf.open(manifest_name) as f:
+                    contacts = read_manifest(f)
+        archive.seek(0)
+
+    sources = []
+    if archive is not None:
+        sources.append(_iter_zip_entries(archive))
+    if files:
+        sources.append(_iter_upload_entries(files))
+
+    entries, skipped = [], []
+    for source in sources:
+        for filename, size, opener in source:
+            ext = os.path.splitext(filename)[1].lower()
+            if ext == ".csv":
+                continue
+            if ext not in RESUME_EXTENSIONS:
+                skipped.append({"file": filename, "reason": "Unsupported file type"})
+                continue
+            if size is not None and size > max_bytes:
+                skipped.append({"file": filename, "reason": f"Larger than {settings.BULK_IMPORT_MAX_FILE_MB} MB"})
+                continue
+            if len(entries) >= settings.BULK_IMPORT_MAX_FILES:
+                skipped.append({"file": filename, "reason": "Import limit reached"})
+                continue
+
+            try:
+                with opener() as stream:
+                    blob_key, file_hash = save_upload(stream, prefix, filename, settings.BULK_IMPORT_MAX_FILE_MB)
+            except BlobTooLarge:
+                skipped.append({"file": filename, "reason": f"Larger than {settings.BULK_IMPORT_MAX_FILE_MB} MB"})
+                continue
+
+            name, email = contacts.get(filename.lower(), (None, None))
+            entries.append({
+                "blob_key": blob_key,
+                "file_hash": file_hash,
+                # No manifest row: name from the file name, email is read from the resume by the scanner
+                "candidate_name": name or os.path.splitext(filename)[0].replace("_", " ").strip(),
+                "candidate_email": email,
+            })
+
+    return entries, skipped
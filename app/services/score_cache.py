@@ -0,0 +1,123 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+import redis
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import ScoreCache
+from app.services.ai_service import RESUME_PROMPT_VERSION, RESUME_SCORING_MODEL, analyze_resume
+
+# analyze_resume runs at temperature 0, so the same (model, prompt version, candidate input, JD)
+# always gives the same answer. Results are kept in Postgres (survive Redis flushes / restarts),
+# per company; hit/miss counters are shared in Redis (one hash per company) so every API /
+# worker process reports the same rate. Expired rows are purged by purge_score_cache_task.
+
+
+def _stats_key(company_id: int) -> str:
+    return f"score_cache:stats:{company_id}"
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1.0)
+    return _client
+
+
+def _count(company_id: int, field: str):
+    try:
+        _get_client().hincrby(_stats_key(company_id), field, 1)
+    except redis.RedisError:
+        pass
+
+
+def _normalize(text: str) -> str:
+    # Whitespace only: case and punctuation are part of the prompt the model sees
+    return " ".join((text or "").split())
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(_normalize(text).encode("utf-8")).hexdigest()
+
+
+def make_key(company_id: int, candidate_text: str, job_description: str,
+             skill_hints: dict | None = None) -> tuple[str, str]:
+    """(cache key, JD hash). Skill hints are part of the prompt, so they are part of the key."""
+    candidate_hash = hash_text(candidate_text + "\n" + json.dumps(skill_hints or {}, sort_keys=True))
+    jd_hash = hash_text(job_description)
+    key = hashlib.sha256(
+        f"{company_id}|{RESUME_SCORING_MODEL}|{RESUME_PROMPT_VERSION}|{candidate_hash}|{jd_hash}".encode("utf-8")
+    ).hexdigest()
+    return key, jd_hash
+
+
+def cached_analyze_resume(db: Session, company_id: int, candidate_text: str, job_description: str,
+                          skill_hints: dict | None = None):
+    """analyze_resume() behind the company's score cache. Failed calls are never cached."""
+    if not settings.SCORE_CACHE_ENABLED:
+        return analyze_resume(candidate_text, job_description, skill_hints)
+
+    key, jd_hash = make_key(company_id, candidate_text, job_description, skill_hints)
+    entry = db.query(ScoreCache).filter(ScoreCache.key == key, ScoreCache.expires_at > func.now()).first()
+    if entry:
+        _count(company_id, "hits")
+        print(f"🎯 Score cache hit ({key[:12]})")
+        return entry.result
+
+    _count(company_id, "misses")
+    result = analyze_resume(candidate_text, job_description, skill_hints)
+    if "error" not in result:
+        expires_at = datetime.now(timezone.utc) + timedelta(days=settings.SCORE_CACHE_TTL_DAYS)
+        # Upsert: an expired row (or a concurrent worker's row) is simply replaced
+        statement = insert(ScoreCache).values(
+            key=key, jd_hash=jd_hash, company_id=company_id, result=result, expires_at=expires_at
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[ScoreCache.key],
+            set_={"result": result, "expires_at": expires_at, "created_at": func.now()}
+        ))
+        db.commit()
+    return result
+
+
+def invalidate_job_description(db: Session, company_id: int, job_description: str) -> int:
+    """Drops this company's cached scores for the JD text (other tenants' entries are untouched)."""
+    deleted = db.query(ScoreCache).filter(
+        ScoreCache.company_id == company_id,
+        ScoreCache.jd_hash == hash_text(job_description)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def purge_expired(db: Session) -> int:
+    deleted = db.query(ScoreCache).filter(ScoreCache.expires_at <= func.now()).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def get_score_cache_stats(db: Session, company_id: int) -> dict:
+    try:
+        raw = _get_client().hgetall(_stats_key(company_id))
+        stats = {k.decode(): int(v) for k, v in raw.items()}
+    except redis.RedisError:
+        stats = {}
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    lookups = hits + misses
+    return {
+        "enabled": settings.SCORE_CACHE_ENABLED,
+        "prompt_version": RESUME_PROMPT_VERSION,
+        "model": RESUME_SCORING_MODEL,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "entries": db.query(func.count(ScoreCache.key)).filter(
+            ScoreCache.company_id == company_id, ScoreCache.expires_at > func.now()
+        ).scalar(),
+    }
@@ -0,0 +1,247 @@
+from collections import deque
+
+# Local skill extraction: a skill/synonym dictionary compiled into one Aho-Corasick automaton.
+# A text is scanned once (linear in its length, independent of the number of skills),
+# so JD + resume skill sets are available instantly without any LLM call.
+
+# Canonical skill -> aliases (matched case-insensitively, on word boundaries).
+# Only aliases are matched, so ambiguous names ("Go", "Express") stay out of the list.
+# Skills whose name is also an everyday English word ("excel at", "react to", "spark ideas",
+# "git gud") only get unambiguous aliases here ("react.js", "apache spark", "ms excel"...);
+# their bare names are in PROPER_NOUN_ALIASES below.
+SKILL_SYNONYMS = {
+    # Languages
+    "Python": ["python", "python3"],
+    "Java": ["java"],
+    "JavaScript": ["javascript", "js", "ecmascript", "es6"],
+    "TypeScript": ["typescript"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    "Go": ["golang"],
+    "Rust": ["rust lang", "rustlang", "rust programming"],
+    "Ruby": ["ruby"],
+    "PHP": ["php"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swiftui", "swift programming", "ios swift"],
+    "Scala": ["scala"],
+    "SQL": ["sql"],
+    "Bash": ["bash", "shell scripting"],
+    # Backend / frameworks
+    "FastAPI": ["fastapi"],
+    "Django": ["django"],
+    "Flask": ["python flask"],
+    "Spring Boot": ["spring boot", "springboot"],
+    "Node.js": ["node.js", "nodejs", "node js"],
+    "Express": ["express.js", "expressjs"],
+    ".NET": [".net", "dotnet", "asp.net"],
+    "Ruby on Rails": ["ruby on rails", "ror"],
+    "GraphQL": ["graphql"],
+    "REST APIs": ["rest api", "rest apis", "restful"],
+    "gRPC": ["grpc"],
+    "Microservices": ["microservices", "microservice"],
+    "Celery": ["celery worker", "celery workers"],
+    # Frontend
+    "React": ["react.js", "reactjs", "react native", "react hooks", "react developer"],
+    "Angular": ["angular", "angularjs"],
+    "Vue.js": ["vue.js", "vuejs", "vue 3"],
+    "Next.js": ["next.js", "nextjs"],
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3"],
+    "Tailwind CSS": ["tailwind", "tailwindcss"],
+    # Data stores
+    "PostgreSQL": ["postgresql", "postgres", "psql"],
+    "MySQL": ["mysql"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Elasticsearch": ["elasticsearch", "elastic search"],
+    "Kafka": ["kafka", "apache kafka"],
+    "RabbitMQ": ["rabbitmq"],
+    "Snowflake": ["snowflake data warehouse"],
+    # Cloud / DevOps
+    "AWS": ["aws", "amazon web services"],
+    "Azure": ["microsoft azure", "azure devops", "azure cloud"],
+    "GCP": ["gcp", "google cloud", "google cloud platform"],
+    "Docker": ["docker", "containerization"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "Ansible": ["ansible"],
+    "CI/CD": ["ci/cd", "cicd", "continuous integration", "continuous delivery"],
+    "Jenkins": ["jenkins"],
+    "GitHub Actions": ["github actions"],
+    "Git": ["github", "gitlab", "git version control"],
+    "Linux": ["linux", "unix"],
+    # Data / AI
+    "Machine Learning": ["machine learning"],
+    "Deep Learning": ["deep learning"],
+    "NLP": ["nlp", "natural language processing"],
+    "LLMs": ["llm", "llms", "large language models", "generative ai", "genai"],
+    "RAG": ["retrieval augmented generation", "retrieval-augmented generation"],
+    "LangChain": ["langchain"],
+    "PyTorch": ["pytorch"],
+    "TensorFlow": ["tensorflow"],
+    "scikit-learn": ["scikit-learn", "sklearn"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "Spark": ["pyspark", "apache spark", "spark sql", "spark streaming"],
+    "Airflow": ["airflow", "apache airflow"],
+    "Power BI": ["power bi", "powerbi"],
+    "Tableau": ["tableau desktop", "tableau dashboards"],
+    "Excel": ["ms excel", "microsoft excel", "advanced excel", "excel vba"],
+    # Practices / soft skills
+    "Agile": ["agile methodology", "agile methodologies", "scrum", "kanban"],
+    "System Design": ["system design"],
+    "Unit Testing": ["unit testing", "pytest", "junit", "tdd"],
+    "Communication": ["communication skills"],
+    "Leadership": ["leadership", "team lead"],
+    "Project Management": ["project management"],
+    "Recruitment": ["recruitment", "talent acquisition"],
+    "Payroll": ["payroll"],
+}
+
+# Aliases that are ordinary words in lower case: matched case-sensitively, as proper nouns /
+# acronyms only. A Capitalized alias right after a sentence end (". Excel at ...") is ignored,
+# at the start of a line (skill lists, bullets) it counts.
+PROPER_NOUN_ALIASES = {
+    "Excel": ["Excel", "MS-Excel"],
+    "Swift": ["Swift"],
+    "React": ["React", "ReactJS", "React.js"],
+    "Spark": ["Spark", "PySpark"],
+    "Rust": ["Rust"],
+    "RAG": ["RAG"],
+    "Git": ["Git", "GIT"],
+    "Machine Learning": ["ML"],
+    "TypeScript": ["TypeScript"],
+    "Flask": ["Flask"],
+    "Ruby on Rails": ["Rails"],
+    "Celery": ["Celery"],
+    "Vue.js": ["Vue", "VueJS"],
+    "Snowflake": ["Snowflake"],
+    "Azure": ["Azure"],
+    "Tableau": ["Tableau"],
+    "Agile": ["Agile"],
+}
+
+
+class SkillMatcher:
+    """
+    Aho-Corasick automaton over all aliases. find() walks the text once and returns the
+    canonical skills whose alias occurs as a whole word ("java" does not match "javascript",
+    "go" is only matched as "golang" to avoid false positives).
+    case_sensitive=True matches aliases as written and skips Capitalized words that start a sentence.
+    """
+
+    def __init__(self, synonyms: dict[str, list[str]], case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self._goto = [{}]       # state -> {char: next state}
+        self._fail = [0]
+        self._output = [[]]     # state -> [(canonical skill, alias length)]
+
+        for skill, aliases in synonyms.items():
+            for alias in set(aliases):
+                self._add(alias if case_sensitive else alias.lower(), skill)
+        self._build_failure_links()
+
+    def _add(self, alias: str, skill: str):
+        state = 0
+        for char in alias:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append((skill, len(alias)))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Suffix matches are reported from this state too
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_positions(self, text: str) -> dict[str, int]:
+        """Canonical skill -> end offset of its first occurrence in text."""
+        text = text or ""
+        if not self.case_sensitive:
+            text = text.lower()
+        found = {}
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for skill, length in self._output[state]:
+                start = end - length + 1
+                if skill not in found and _is_whole_word(text, start, end + 1) and \
+                        not (self.case_sensitive and _starts_sentence(text, start)):
+                    found[skill] = end
+        return found
+
+    def find(self, text: str) -> list[str]:
+        """Canonical skills found in text, in order of first appearance."""
+        found = self.find_positions(text)
+        return sorted(found, key=found.get)
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not (_is_word_char(before) and _is_word_char(text[start])) and \
+        not (_is_word_char(after) and _is_word_char(text[end - 1]))
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char in "+#"
+
+
+def _starts_sentence(text: str, start: int) -> bool:
+    """Capitalized (not all-caps) word right after . ! ? - capitalized by grammar, not a name."""
+    word = text[start:start + 2]
+    if not (word[:1].isupper() and word[1:].islower()):
+        return False
+    before = text[:start].rstrip(" \t")
+    return before.endswith((".", "!", "?"))
+
+
+_matchers = None
+
+
+def get_skill_matchers() -> tuple[SkillMatcher, SkillMatcher]:
+    """(case-insensitive, proper-noun) matchers, compiled once per process (the dictionaries are static)."""
+    global _matchers
+    if _matchers is None:
+        _matchers = (SkillMatcher(SKILL_SYNONYMS), SkillMatcher(PROPER_NOUN_ALIASES, case_sensitive=True))
+    return _matchers
+
+
+def extract_skills(text: str) -> list[str]:
+    found = {}
+    for matcher in get_skill_matchers():
+        for skill, end in matcher.find_positions(text).items():
+            found[skill] = min(end, found.get(skill, end))
+    return sorted(found, key=found.get)
+
+
+def compare_skills(required: list[str], candidate: list[str]):
+    """(matched, missing) in the order of the job's required skills."""
+    have = set(candidate or [])
+    matched = [skill for skill in required or [] if skill in have]
+    missing = [skill for skill in required or [] if skill not in have]
+    return matched, missing
+
+
+def merge_missing_skills(local: list[str], llm: list[str]) -> list[str]:
+    """Adds skills the LLM flagged as missing that the dictionary doesn't know (case-insensitive dedupe)."""
+    merged = list(local or [])
+    seen = {skill.lower() for skill in merged}
+    for skill in llm or []:
+        if isinstance(skill, str) and skill.strip() and skill.strip().lower() not in seen:
+            merged.append(skill.strip())
+            seen.add(skill.strip().lower())
+    return merged
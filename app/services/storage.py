@@ -0,0 +1,148 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+from app.config import settings
+
+# Blob Store: uploads are streamed into a shared store and Celery tasks get the blob key.
+# API and workers therefore don't need a common filesystem (BLOB_BACKEND=s3).
+#   local : files under BLOB_LOCAL_DIR (single node, or a shared mount)
+#   s3    : S3-compatible bucket (boto3 is only imported when this backend is used)
+
+_BLOCK_SIZE = 1024 * 1024
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+class _HashingReader:
+    """File-like wrapper: sha256 + size of everything read, aborts past max_bytes."""
+
+    def __init__(self, source, max_bytes: int | None):
+        self.source = source
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        block = self.source.read(_BLOCK_SIZE if size is None or size < 0 else size)
+        self.size += len(block)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise BlobTooLarge(f"File exceeds {self.max_bytes // (1024 * 1024)} MB")
+        self.digest.update(block)
+        return block
+
+
+def new_key(prefix: str, filename: str) -> str:
+    """Unique key that keeps the original file name (extension decides the text extractor)."""
+    name = os.path.basename(filename or "") or "file"
+    return f"{prefix}/{uuid.uuid4().hex}/{name}"
+
+
+class LocalBlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def put_stream(self, key: str, source, max_bytes: int | None = None) -> str:
+        """Copies source to the store in blocks; returns its sha256."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        reader = _HashingReader(source, max_bytes)
+        try:
+            with open(path, "wb") as buffer:
+                for block in iter(lambda: reader.read(_BLOCK_SIZE), b""):
+                    buffer.write(block)
+        except BaseException:
+            self.delete(key)
+            raise
+        return reader.digest.hexdigest()
+
+    @contextmanager
+    def local_copy(self, key: str):
+        # Already on disk, nothing to download
+        yield self._path(key)
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+
+class S3BlobStore:
+    def __init__(self):
+        import boto3  # Optional dependency, only for BLOB_BACKEND=s3
+
+        if not settings.S3_BUCKET:
+            raise RuntimeError("S3_BUCKET must be set when BLOB_BACKEND=s3")
+        self.bucket = settings.S3_BUCKET
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+        )
+
+    def put_stream(self, key: str, source, max_bytes: int | None = None) -> str:
+        # upload_fileobj reads the stream in parts (multipart upload for big files)
+        reader = _HashingReader(source, max_bytes)
+        self.client.upload_fileobj(reader, self.bucket, key)
+        return reader.digest.hexdigest()
+
+    @contextmanager
+    def local_copy(self, key: str):
+        """Downloads the blob to a temp dir (same file name) for libraries that need a path."""
+        with tempfile.TemporaryDirectory(prefix="blob_") as tmp_dir:
+            path = os.path.join(tmp_dir, os.path.basename(key))
+            self.client.download_file(self.bucket, key, path)
+            yield path
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+_store = None
+
+
+def get_blob_store():
+    """Process-wide store for the configured BLOB_BACKEND."""
+    global _store
+    if _store is None:
+        if settings.BLOB_BACKEND == "s3":
+            _store = S3BlobStore()
+        else:
+            _store = LocalBlobStore(settings.BLOB_LOCAL_DIR)
+    return _store
+
+
+def save_upload(source, prefix: str, filename: str, max_mb: int | None = None):
+    """
+    Streams an upload into the blob store (hashing on the way, size limit enforced).
+    Returns (key, sha256). Blocking: call it via run_in_threadpool from async handlers.
+    """
+    key = new_key(prefix, filename)
+    max_mb = settings.MAX_UPLOAD_MB if max_mb is None else max_mb
+    file_hash = get_blob_store().put_stream(key, source, max_bytes=max_mb * 1024 * 1024)
+    return key, file_hash
+
+
+def delete_blobs(keys):
+    store = get_blob_store()
+    for key in keys or []:
+        try:
+            store.delete(key)
+        except Exception as e:
+            print(f"⚠️ Could not delete blob {key}: {e}")
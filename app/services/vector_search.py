@@ -0,0 +1,160 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+# Every vector column that gets a managed ANN index: (table, vector column, tenant column).
+# The tenant column gets a btree index so small tenants can be filtered first and sorted exactly.
+VECTOR_INDEXES = [
+    ("document_chunks", "embedding", "company_id"),
+    ("candidate_profiles", "embedding", "company_id"),
+]
+
+# pgvector operator class per distance metric (must match the ORDER BY operator to use the index)
+_OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "inner_product": "vector_ip_ops",
+}
+
+
+def distance(column, vector):
+    """
+    Distance expression for ORDER BY, using the metric configured in VECTOR_DISTANCE.
+    MiniLM vectors are normalized, so cosine / inner product rank the same as L2 but
+    are cheaper and match the index operator class.
+    """
+    metric = settings.VECTOR_DISTANCE
+    if metric == "cosine":
+        return column.cosine_distance(vector)
+    if metric == "inner_product":
+        return column.max_inner_product(vector)
+    return column.l2_distance(vector)
+
+
+def distance_to_similarity(value: float) -> float:
+    """Turns a distance() result back into a cosine similarity (vectors are normalized)."""
+    metric = settings.VECTOR_DISTANCE
+    if metric == "cosine":
+        return 1.0 - value
+    if metric == "inner_product":
+        return -value  # pgvector's <#> returns the negative inner product
+    return 1.0 - (value ** 2) / 2
+
+
+def _index_name(table: str, column: str) -> str:
+    return f"ix_{table}_{column}_{settings.VECTOR_INDEX_TYPE}_{settings.VECTOR_DISTANCE}"
+
+
+def _index_ddl(table: str, column: str) -> str:
+    metric = settings.VECTOR_DISTANCE
+    index_type = settings.VECTOR_INDEX_TYPE
+
+    if index_type == "ivfflat":
+        options = f"lists = {int(settings.IVFFLAT_LISTS)}"
+    else:
+        options = f"m = {int(settings.HNSW_M)}, ef_construction = {int(settings.HNSW_EF_CONSTRUCTION)}"
+
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_index_name(table, column)} ON {table} "
+        f"USING {index_type} ({column} {_OPERATOR_CLASSES[metric]}) WITH ({options})"
+    )
+
+
+def _drop_if_invalid(conn, name: str):
+    """
+    A failed / interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind,
+    which IF NOT EXISTS would then skip forever. Drop it so it gets rebuilt.
+    """
+    valid = conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+    if valid is False:
+        print(f"🧹 Dropping invalid index {name} (interrupted build), rebuilding it")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def ensure_vector_indexes(conn):
+    """
+    Creates the ANN + tenant indexes if they don't exist yet (or are INVALID).
+    conn must be an AUTOCOMMIT connection: CREATE INDEX CONCURRENTLY keeps existing tables
+    writable while the index builds, but can't run inside a transaction.
+    Called from app.db_setup under an advisory lock, never from several processes at once.
+    """
+    for table, column, tenant_column in VECTOR_INDEXES:
+        indexes = [
+            (f"ix_{table}_{tenant_column}",
+             f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{tenant_column} ON {table} ({tenant_column})"),
+            (_index_name(table, column), _index_ddl(table, column)),
+        ]
+        for name, statement in indexes:
+            try:
+                _drop_if_invalid(conn, name)
+                conn.execute(text(statement))
+            except Exception as e:
+                print(f"⚠️ Could not create index {name} on {table}: {e}")
+
+
+_iterative_scan_supported = None
+
+
+def _supports_iterative_scan(db: Session) -> bool:
+    """hnsw/ivfflat.iterative_scan exist from pgvector 0.8 (older versions reject the setting)."""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        version = db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+        try:
+            _iterative_scan_supported = tuple(int(part) for part in (version or "0").split(".")[:2]) >= (0, 8)
+        except ValueError:
+            _iterative_scan_supported = False
+        if not _iterative_scan_supported:
+            print(f"⚠️ pgvector {version} has no iterative index scans; filtered searches fall back to exact scans")
+    return _iterative_scan_supported
+
+
+def configure_search(db: Session):
+    """
+    Applies per-query ANN settings (transaction-local, so call it right before the search query).
+    - hnsw.ef_search / ivfflat.probes: recall vs latency trade-off.
+    - hnsw.iterative_scan (pgvector >= 0.8): keeps scanning the graph until enough rows pass
+      the company_id filter, so small tenants still get k results from a shared index.
+    """
+    if settings.VECTOR_INDEX_TYPE == "ivfflat":
+        params = {"ivfflat.probes": settings.IVFFLAT_PROBES}
+        iterative_param = "ivfflat.iterative_scan"
+    else:
+        params = {"hnsw.ef_search": settings.HNSW_EF_SEARCH}
+        iterative_param = "hnsw.iterative_scan"
+
+    if settings.VECTOR_ITERATIVE_SCAN != "off" and _supports_iterative_scan(db):
+        params[iterative_param] = settings.VECTOR_ITERATIVE_SCAN
+
+    _set_local(db, params)
+
+
+def _set_local(db: Session, params: dict):
+    for name, value in params.items():
+        db.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": str(value)})
+
+
+def nearest(db: Session, query, limit: int, enough=None):
+    """
+    Runs a query ordered by distance() through the ANN index. The index post-filters on the
+    tenant (and any other WHERE), so a small tenant in a big shared table can come back short;
+    then the query is re-run as an exact scan (tenant btree first, then sort), which always
+    returns every matching row. enough(rows) decides when a result is complete (default:
+    limit rows).
+    """
+    enough = enough or (lambda rows: len(rows) >= limit)
+    configure_search(db)
+    rows = query.limit(limit).all()
+    if enough(rows):
+        return rows
+
+    # Put back whatever the session / role had, not the server default
+    previous = db.execute(text("SELECT current_setting('enable_indexscan')")).scalar()
+    _set_local(db, {"enable_indexscan": "off"})
+    try:
+        return query.limit(limit).all()
+    finally:
+        _set_local(db, {"enable_indexscan": previous})
@@ -0,0 +1,76 @@
+"""
+Throughput benchmark for document_chunks writes.
+
+Compares one ORM object per chunk (the old ingestion loop) with the bulk writer
+in executemany and binary COPY modes, against the database in DATABASE_URL.
+Every run happens inside a transaction that is rolled back, so nothing is kept.
+
+Usage: python benchmark_chunk_writes.py [num_chunks] [repeats]
+"""
+import random
+import sys
+import time
+
+from app.database import SessionLocal
+from app.models import Company, Document, DocumentChunk
+from app.services.chunk_writer import bulk_insert_chunks
+
+DIMENSIONS = 384
+
+
+def make_rows(count: int):
+    rows = []
+    for i in range(count):
+        vector = [random.uniform(-1, 1) for _ in range(DIMENSIONS)]
+        norm = sum(v * v for v in vector) ** 0.5
+        rows.append({
+            "ordinal": i,
+            "content": f"Benchmark chunk {i}. " + "Policy text for leave and benefits. " * 25,
+            "embedding": [v / norm for v in vector],
+        })
+    return rows
+
+
+def write_orm(db, rows):
+    for row in rows:
+        db.add(DocumentChunk(**row))
+    db.flush()
+
+
+def run(label, writer, rows, repeats):
+    timings = []
+    for _ in range(repeats):
+        db = SessionLocal()
+        try:
+            company = Company(name=f"benchmark-{random.random()}")
+            db.add(company)
+            db.flush()
+            document = Document(filename="benchmark.pdf", company_id=company.id)
+            db.add(document)
+            db.flush()
+
+            batch = [dict(row, document_id=document.id, company_id=company.id) for row in rows]
+            started_at = time.perf_counter()
+            writer(db, batch)
+            timings.append(time.perf_counter() - started_at)
+        finally:
+            db.rollback()
+            db.close()
+
+    best = min(timings)
+    print(f"{label:<14} best {best:7.3f}s  ->  {len(rows) / best:9.1f} chunks/sec")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rows = make_rows(count)
+    print(f"Writing {count} chunks x {repeats} runs")
+
+    run("orm add()", write_orm, rows, repeats)
+    run("executemany", lambda db, batch: bulk_insert_chunks(db, batch, mode="executemany"), rows, repeats)
+    run("binary COPY", lambda db, batch: bulk_insert_chunks(db, batch, mode="copy"), rows, repeats)
+
+
+if __name__ == "__main__":
+    main()
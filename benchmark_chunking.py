@@ -0,0 +1,69 @@
+"""
+Micro-benchmark: LangChain RecursiveCharacterTextSplitter (1000/200 chars, new
+instance per call - the old create_chunks) vs the token-aware TokenChunker.
+
+Reports throughput, chunk count and how many chunks exceed the embedding model
+window (those get silently truncated by MiniLM).
+
+Usage: python benchmark_chunking.py [file.pdf|.docx|.txt] [repeats]
+       (without a file, a synthetic policy text is used)
+"""
+import sys
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.services.chunker import get_chunker
+from app.services.document_service import extract_text_from_file
+
+MODEL_WINDOW = 256 - 2  # [CLS] + [SEP]
+
+
+def synthetic_text(paragraphs: int = 2000) -> str:
+    paragraph = (
+        "Employees are entitled to twenty days of paid leave per calendar year. "
+        "Sick leave requires a medical certificate after two consecutive days. "
+        "Requests must be submitted through the HR portal at least one week in advance.\n"
+    )
+    return "\n".join(f"Section {i}. {paragraph}" for i in range(paragraphs))
+
+
+def old_create_chunks(text: str):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", ".", " ", ""]
+    )
+    return splitter.split_text(text)
+
+
+def run(label, split, text, repeats, chunker):
+    timings = []
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        chunks = split(text)
+        timings.append(time.perf_counter() - started_at)
+
+    best = min(timings)
+    token_counts = chunker.count_tokens(chunks)
+    truncated = sum(1 for count in token_counts if count > MODEL_WINDOW)
+    megabytes = len(text.encode("utf-8")) / 1e6
+    print(f"{label:<22} {best:7.3f}s  {megabytes / best:7.2f} MB/s  "
+          f"{len(chunks):6d} chunks  avg {sum(token_counts) / max(len(chunks), 1):6.1f} tokens  "
+          f"{truncated:5d} truncated")
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    text = extract_text_from_file(path) if path else synthetic_text()
+
+    chunker = get_chunker()  # loads the tokenizer once, outside the timed region
+    print(f"Input: {len(text):,} chars, best of {repeats} runs")
+
+    run("RecursiveCharacter", old_create_chunks, text, repeats, chunker)
+    run("TokenChunker", chunker.split_text, text, repeats, chunker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import pytest
+
+from app.services.leave_rules import DEFAULT_LEAVE_RULES, evaluate_leave, merge_rules
+
+
+def recommendation(reason, days, rules=None):
+    decision = evaluate_leave(rules, reason, days)
+    return decision["recommendation"] if decision else None
+
+
+@pytest.mark.parametrize("reason, days, expected", [
+    # Long leaves always go to a human, whatever the reason
+    ("High fever", 4, "Human-Review"),
+    ("Personal work", 10, "Human-Review"),
+    # Review keywords win over auto-approve keywords
+    ("Sick, but also a short trip", 1, "Human-Review"),
+    ("Family wedding", 2, "Human-Review"),
+    # Short leaves with a clear reason
+    ("I have fever", 1, "Auto-Approve"),
+    ("Doctor appointment", 2, "Auto-Approve"),
+    ("Down with flu, can't come", 1, "Auto-Approve"),
+    # Auto-approve keyword, but longer than auto_approve.max_days
+    ("Sick", 3, None),
+    # No rule applies
+    ("Need a day off", 1, None),
+])
+def test_decision_table(reason, days, expected):
+    assert recommendation(reason, days) == expected
+
+
+@pytest.mark.parametrize("reason", [
+    "not sick, just want a day off",
+    "I'm not feeling sick",
+    "no fever, but tired",
+    "isn't a medical thing",
+    "ill-timed meeting",
+    "cold feet about the presentation",
+    "sick of this project",
+])
+def test_negated_or_idiomatic_keywords_go_to_triage(reason):
+    assert recommendation(reason, 1) is None
+
+
+def test_merge_rules_overrides_single_fields():
+    rules = merge_rules({"auto_approve": {"max_days": 1}, "review": {"keywords": ["conference"]}})
+    assert rules["auto_approve"]["max_days"] == 1
+    assert rules["auto_approve"]["keywords"] == DEFAULT_LEAVE_RULES["auto_approve"]["keywords"]
+    assert rules["review"]["keywords"] == ["conference"]
+    assert rules["review"]["min_days"] == DEFAULT_LEAVE_RULES["review"]["min_days"]
+
+
+def test_merge_rules_ignores_unknown_sections_and_nulls():
+    rules = merge_rules({"other": {"x": 1}, "auto_approve": {"max_days": None}})
+    assert "other" not in rules
+    assert rules["auto_approve"]["max_days"] == DEFAULT_LEAVE_RULES["auto_approve"]["max_days"]
+    assert merge_rules(None) == DEFAULT_LEAVE_RULES
+
+
+def test_company_overrides_change_decisions():
+    company_rules = {"auto_approve": {"keywords": ["exam"], "max_days": 3}, "review": {"min_days": 5}}
+    assert recommendation("University exam", 3, company_rules) == "Auto-Approve"
+    assert recommendation("Fever", 1, company_rules) is None
+    assert recommendation("University exam", 5, company_rules) == "Human-Review"
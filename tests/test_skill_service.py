@@ -0,0 +1,27 @@
+import pytest
+
+from app.services.skill_service import compare_skills, extract_skills
+
+
+@pytest.mark.parametrize("text", [
+    "...can excel at a swift pace, react to feedback, spark ideas...",
+    "Prevent rust on the tools, wear a rag; git gud",
+    "The ts and ml columns of the report",
+    "Met the deadline. Excel at teamwork. React quickly. Spark joy.",
+])
+def test_everyday_words_are_not_skills(text):
+    assert extract_skills(text) == []
+
+
+def test_proper_nouns_and_tech_context_are_skills():
+    text = "Skills:\nReact, Swift, Excel\n• Rust\nBuilt RAG pipelines and ML models with Apache Spark on GitHub."
+    assert extract_skills(text) == ["React", "Swift", "Excel", "Rust", "RAG", "Machine Learning", "Spark", "Git"]
+
+
+def test_whole_words_only():
+    assert extract_skills("JavaScript developer") == ["JavaScript"]
+    assert extract_skills("Go to the office, golang services") == ["Go"]
+
+
+def test_compare_skills_keeps_job_order():
+    assert compare_skills(["Python", "Docker", "AWS"], ["AWS", "Python"]) == (["Python", "AWS"], ["Docker"])